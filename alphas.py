@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Tabulation of alphas(Q) for arrays of Q and all members of a set. Usage:
+
+    ./alphas.py [-pdf PDF] [-Q-lo LO] [-Q-hi HI] [-nQ N] [-err | -fullerr | -members] [-out OUT]
+
+For sets with AlphaS_Type "ipol" (the usual case), the AlphaS_Qs and
+AlphaS_Vals of each member (from its .dat header, or else from the .info
+file) are interpolated directly with numpy, following what LHAPDF's
+AlphaS_Ipol does; other types fall back to pdf.alphasQ point by point.
+Tables are memoized per set and dataversion.
+"""
+import argparse
+from math import log10
+from pdf_base import *
+import read_lhapdf
+
+
+#----------------------------------------------------------------------
+class alphasIpol(object):
+    """\
+    Vectorised version of LHAPDF's AlphaS_Ipol: cubic Hermite
+    interpolation in ln Q^2, separately in each subgrid between flavour
+    thresholds (signalled by repeated Q values), power-law extrapolation
+    below the grid and a constant above it.
+    """
+    def __init__(self, Qs, alphas):
+        self.q2s = np.asarray(Qs, dtype=float)**2
+        self.alphas = np.asarray(alphas, dtype=float)
+
+        # split into subgrids at repeated Q values
+        breaks = np.nonzero(self.q2s[1:] == self.q2s[:-1])[0] + 1
+        self.subgrids = []
+        for lo, hi in zip(np.concatenate(([0], breaks)), np.concatenate((breaks, [len(self.q2s)]))):
+            logq2 = np.log(self.q2s[lo:hi])
+            vals  = self.alphas[lo:hi]
+            slopes = np.diff(vals) / np.diff(logq2)
+            # forward difference at the first node, backward at the last
+            # one, and central (average of both) elsewhere
+            derivs = np.empty(len(vals))
+            derivs[0]  = slopes[0]
+            derivs[-1] = slopes[-1]
+            derivs[1:-1] = 0.5 * (slopes[:-1] + slopes[1:])
+            self.subgrids.append((self.q2s[hi-1], logq2, vals, derivs))
+
+        # gradient for the extrapolation below the grid, skipping over a
+        # possible threshold at the first knot
+        next_point = 1
+        while (self.q2s[0] == self.q2s[next_point]): next_point += 1
+        self.loggrad = (log10(self.alphas[next_point]/self.alphas[0])
+                        / log10(self.q2s[next_point]/self.q2s[0]))
+
+    def alphasQ(self, Qs):
+        "returns alphas for an array of Q values"
+        q2 = np.asarray(Qs, dtype=float)**2
+        res = np.empty(q2.shape)
+
+        below = q2 < self.q2s[0]
+        res[below] = self.alphas[0] * (q2[below]/self.q2s[0])**self.loggrad
+        above = q2 > self.q2s[-1]
+        res[above] = self.alphas[-1]
+
+        # as in LHAPDF, a Q that sits on a threshold uses the subgrid above it
+        remaining = ~(below | above)
+        for isub, (q2_hi, logq2, vals, derivs) in enumerate(self.subgrids):
+            if (isub+1 < len(self.subgrids)):
+                sel = remaining & (q2 < q2_hi)
+            else:
+                sel = remaining
+            # not in place: for the last subgrid, sel is remaining itself
+            remaining = remaining & ~sel
+            if (not np.any(sel)): continue
+
+            logq = np.log(q2[sel])
+            i = np.clip(np.searchsorted(logq2, logq, side='right') - 1, 0, len(logq2)-2)
+            dlogq2 = logq2[i+1] - logq2[i]
+            t = (logq - logq2[i]) / dlogq2
+            t2 = t*t
+            t3 = t2*t
+            res[sel] = (( 2*t3 - 3*t2 + 1) * vals[i]
+                      + (   t3 - 2*t2 + t) * derivs[i]   * dlogq2
+                      + (-2*t3 + 3*t2    ) * vals[i+1]
+                      + (   t3 -   t2    ) * derivs[i+1] * dlogq2)
+        return res
+
+
+class alphasFallback(object):
+    "point-by-point evaluation with LHAPDF, for non-ipol alphas types"
+    def __init__(self, pdf):
+        self.pdf = pdf
+
+    def alphasQ(self, Qs):
+        Qs = np.asarray(Qs, dtype=float)
+        return np.fromiter((self.pdf.alphasQ(Q) for Q in Qs.flat),
+                           dtype=float, count=Qs.size).reshape(Qs.shape)
+
+
+#----------------------------------------------------------------------
+# memoized evaluators and tables, keyed by (set name, dataversion, ...)
+_evaluators = {}
+_tables = {}
+
+def alphas_evaluator(pdfset, imem):
+    """returns an object with an alphasQ(array) method for member imem,
+    using the set's own running parameters
+    """
+    key = (pdfset.name, pdfset.dataversion, imem)
+    if key not in _evaluators:
+        params = dict(read_lhapdf.read_info(pdfset.name))
+        params.update(read_lhapdf.read_member_header(pdfset.name, imem))
+        if (str(params.get("AlphaS_Type", "")).lower() == "ipol"
+            and "AlphaS_Qs" in params and "AlphaS_Vals" in params):
+            _evaluators[key] = alphasIpol(params["AlphaS_Qs"], params["AlphaS_Vals"])
+        else:
+            _evaluators[key] = alphasFallback(pdfset.mkPDF(imem))
+    return _evaluators[key]
+
+
+def alphas_table(pdfset, Qvals, members = None):
+    """returns an array of shape (len(Qvals), len(members)) with
+    alphas(Q) for each of the members (default: all of them)
+    """
+    if (members is None): members = range(pdfset.size)
+    Qvals = np.asarray(Qvals, dtype=float)
+    members = tuple(members)
+    key = (pdfset.name, pdfset.dataversion, members, Qvals.tobytes())
+    if key not in _tables:
+        table = np.empty((len(Qvals), len(members)))
+        for i, imem in enumerate(members):
+            table[:,i] = alphas_evaluator(pdfset, imem).alphasQ(Qvals)
+        _tables[key] = table
+    return _tables[key]
+
+
+#----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='Print alphas(Q) for a PDF set')
+    parser.add_argument('-pdf', type=str, default=default_pdf, help='PDF name')
+    parser.add_argument('-imem', type=int, default=0, help='The member to examine')
+    parser.add_argument('-err', action='store_true', help='Output the symm err')
+    parser.add_argument('-fullerr', action='store_true', help='Output the full error info')
+    parser.add_argument('-medianerr', action='store_true', help='use a median + interval uncertainty')
+    parser.add_argument('-members', action='store_true', help='Output one column for each member')
+
+    parser.add_argument('-Q-lo', type=float, default=1.0, help='Lowest Q')
+    parser.add_argument('-Q-hi', type=float, default=10000.0, help='Highest Q')
+    parser.add_argument('-nQ', type=int, default=50, help='Number of Q values')
+
+    parser.add_argument('-out', '-o', type=str, dest="out", default="", help='Output file (default is stdout)')
+    parser.add_argument('-prec', type=int, default=5, help='Number of digits of precision in printout (default 5)')
+
+    args = parser.parse_args()
+    err = args.err or args.fullerr
+
+    if (args.out != ""):
+        out = open(args.out,'w')
+    else:
+        out = sys.stdout
+    format="{{:<{}.{}g}}".format(args.prec+7,args.prec)
+
+    pdfset = lhapdf.getPDFSet(args.pdf)
+    Qvals = args.Q_lo*(args.Q_hi/args.Q_lo)**((1.0*np.arange(0,args.nQ))/(max(1,args.nQ-1)))
+
+    print("#", " ".join(sys.argv), file=out)
+    if (err or args.members):
+        table = alphas_table(pdfset, Qvals)
+        print(f"# pdf = {args.pdf}, version = {pdfset.dataversion}", file=out)
+    else:
+        table = alphas_table(pdfset, Qvals, [args.imem])
+        print(f"# pdf = {args.pdf}, imem = {args.imem}, version = {pdfset.dataversion}", file=out)
+
+    if (args.members):
+        print("# Columns: Q alphas(imem=0...{})".format(pdfset.size-1), file=out)
+        print(reformat(Qvals, table, format=format), file=out)
+    elif (err):
+        uncert = bulkUncert(pdfset, table, args.medianerr)
+        header = "# Columns: Q alphas errsymm"
+        columns = [uncert.central, uncert.errsymm]
+        if (args.fullerr):
+            header += " bandlo bandhi"
+            columns += [uncert.central-np.abs(uncert.errminus), uncert.central+uncert.errplus]
+        print(header, file=out)
+        print(reformat(Qvals, np.array(columns).T, format=format), file=out)
+    else:
+        print("# Columns: Q alphas", file=out)
+        print(reformat(Qvals, table[:,0], format=format), file=out)
+
+
+if __name__ == '__main__': main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Monte-Carlo replicas from a Hessian set, written as an LHAPDF replica
+set. Usage:
+
+    ./hessian2mc.py [-pdf PDF] [-nrep N] [-name NAME] [-outdir DIR] [-seed SEED] \\
+                    [-asymmetric] [-chunk N] [-nproc N]
+
+The grids of all members are read once into an array with one row per
+member (in the block structure of read_lhapdf.py), and replica k is
+
+    F_k = F_0 + sum_j R_kj (F_{2j-1} - F_{2j})/2      (hessian)
+    F_k = F_0 + sum_j R_kj (F_j - F_0)                (symmhessian)
+
+with R_kj Gaussian random numbers (from -seed), the eigenvector
+differences being rescaled from the set's ErrorConfLevel to 68%. With
+-asymmetric, a positive R_kj multiplies F_{2j-1} - F_0 and a negative
+one F_0 - F_{2j}. As in other LHAPDF replica sets, member 0 of the new
+set is the mean of the replicas that are written. Replicas are generated -chunk at a time, as a
+single matrix product, and streamed to DIR/NAME/, both as lhagrid1
+text files and as a binary side-cache, NAME.npy, with one row per member
+(cf. cached_member, which returns the Subgrids of a member from it,
+e.g. for read_lhapdf.NodePDF). Formatting the text files dominates the
+run time; -nproc N spreads it over N processes. For LHAPDF to find the
+set, DIR should be in LHAPDF_DATA_PATH.
+"""
+import argparse
+import os
+import time
+from pdf_base import *
+import read_lhapdf
+
+
+#----------------------------------------------------------------------
+class gridLayout(object):
+    """\
+    The block structure of the members of a set, for storing each member
+    as a flat array in the order of the lhagrid1 files (x slowest, then
+    muF, then flavour fastest)
+    """
+    def __init__(self, subgrids):
+        self.blocks = []
+        start = 0
+        for subgrid in subgrids:
+            size = subgrid.tabulation.size
+            self.blocks.append((subgrid.x_values, subgrid.muF_values, subgrid.flavs, slice(start, start+size)))
+            start += size
+        self.size = start
+
+    def flatten(self, subgrids):
+        "returns the flat array for a list of Subgrids with this layout"
+        return np.concatenate([subgrid.tabulation.transpose(0,2,1).ravel() for subgrid in subgrids])
+
+    def subgrids(self, flat):
+        "returns the list of Subgrids for a flat array (as views into it)"
+        return [read_lhapdf.Subgrid(x_values, muF_values, flavs,
+                                    flat[sl].reshape(len(x_values), len(muF_values), len(flavs)).transpose(0,2,1))
+                for x_values, muF_values, flavs, sl in self.blocks]
+
+
+def read_members(pdfname, nmem):
+    "returns the gridLayout of pdfname and an array of shape (nmem, layout.size) with all its members"
+    subgrids = read_lhapdf.read_member(pdfname, 0)
+    layout = gridLayout(subgrids)
+    values = np.empty((nmem, layout.size))
+    values[0] = layout.flatten(subgrids)
+    for imem in range(1, nmem):
+        values[imem] = layout.flatten(read_lhapdf.read_member(pdfname, imem))
+    return layout, values
+
+
+#----------------------------------------------------------------------
+class replicaGenerator(object):
+    """\
+    Replicas as linear combinations of the members of a Hessian set,
+    values[imem, :], with the eigenvector differences multiplied by scale
+    """
+    def __init__(self, values, errtype, scale = 1.0, asymmetric = False):
+        self.central = values[0]
+        self.asymmetric = asymmetric
+        if (errtype == "hessian"):
+            if (asymmetric):
+                self.plus  = scale * (values[1::2] - self.central)
+                self.minus = scale * (values[2::2] - self.central)
+            else:
+                self.deltas = scale * 0.5 * (values[1::2] - values[2::2])
+        elif (errtype == "symmhessian"):
+            if (asymmetric): raise ValueError("-asymmetric needs a set with ErrorType hessian")
+            self.deltas = scale * (values[1:] - self.central)
+        else:
+            raise ValueError("cannot generate replicas from a set with ErrorType "+errtype)
+        self.neig = len(self.plus) if asymmetric else len(self.deltas)
+
+    def replicas(self, R):
+        "returns the replicas, of shape (len(R), size), for the random numbers R of shape (len(R), neig)"
+        if (self.asymmetric):
+            return self.central + np.maximum(R, 0) @ self.plus + np.maximum(-R, 0) @ self.minus
+        else:
+            return self.central + R @ self.deltas
+
+
+#----------------------------------------------------------------------
+def write_member(filename, header, layout, flat):
+    "writes the member with values flat (with the given layout) as an lhagrid1 file"
+    with open(filename, 'w') as out:
+        out.write(header)
+        out.write("---\n")
+        for x_values, muF_values, flavs, sl in layout.blocks:
+            out.write(" ".join(["{:.17g}".format(x) for x in x_values]) + "\n")
+            out.write(" ".join(["{:.17g}".format(Q) for Q in muF_values]) + "\n")
+            out.write(" ".join([str(flav) for flav in flavs]) + "\n")
+            row = " ".join(["%.8e"]*len(flavs)) + "\n"
+            out.write((row * (len(x_values)*len(muF_values))) % tuple(flat[sl]))
+            out.write("---\n")
+
+
+def member_header(pdfname, pdftype):
+    "returns the header of member 0 of pdfname, with its PdfType replaced by pdftype"
+    lines = []
+    with open(read_lhapdf.member_file(pdfname, 0), 'r') as stream:
+        for line in stream:
+            if line.startswith("---"): break
+            if line.startswith("PdfType:"): line = "PdfType: {}\n".format(pdftype)
+            lines.append(line)
+    return "".join(lines)
+
+
+def write_info(pdfname, filename, updates):
+    """writes the .info file of pdfname to filename, with the (single-line)
+    entries in updates replaced or added; entries whose value is None
+    are removed
+    """
+    lines = []
+    with open(f'{read_lhapdf.set_dir(pdfname)}/{pdfname}.info', 'r') as stream:
+        for line in stream:
+            key = line.split(":")[0]
+            if key in updates: continue
+            lines.append(line)
+    for key, value in updates.items():
+        if value is not None: lines.append("{}: {}\n".format(key, value))
+    with open(filename, 'w') as out:
+        out.write("".join(lines))
+
+
+def cached_member(setdir, imem):
+    """returns the list of Subgrids of member imem of a set written by
+    this script, from the binary side-cache in setdir (memory mapped)
+    """
+    name = os.path.basename(os.path.normpath(setdir))
+    with open(os.path.join(setdir, f"{name}_0000.dat"), 'r') as stream:
+        layout = gridLayout(list(read_lhapdf.read_blocks(stream)))
+    cache = np.load(os.path.join(setdir, f"{name}.npy"), mmap_mode='r')
+    return layout.subgrids(cache[imem])
+
+
+#----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='Generate an LHAPDF replica set from a Hessian set')
+    parser.add_argument('-pdf', type=str, default=default_pdf, help='Hessian PDF set')
+    parser.add_argument('-nrep', type=int, default=1000, help='Number of replicas')
+    parser.add_argument('-name', type=str, default="", help='Name of the new set (default: PDF_mc)')
+    parser.add_argument('-outdir', type=str, default=".", help='Directory in which to create the set')
+    parser.add_argument('-seed', type=int, default=1, help='Random seed')
+    parser.add_argument('-asymmetric', action='store_true', help='Use the + and - eigenvectors separately')
+    parser.add_argument('-chunk', type=int, default=100, help='Number of replicas generated at a time')
+    parser.add_argument('-nproc', type=int, default=1, help='Number of processes for writing the text files')
+    args = parser.parse_args()
+
+    start = time.time()
+    pdfset = lhapdf.getPDFSet(args.pdf)
+    name = args.name if args.name != "" else args.pdf+"_mc"
+    setdir = os.path.join(args.outdir, name)
+    os.makedirs(setdir, exist_ok=True)
+
+    layout, values = read_members(args.pdf, pdfset.size)
+    generator = replicaGenerator(values, pdfset.errorType, cl_scale(pdfset), args.asymmetric)
+    del values
+    print("# read {} members of {} ({} grid values each) in {:.2f}s".format(
+        pdfset.size, args.pdf, layout.size, time.time()-start))
+
+    write_info(args.pdf, os.path.join(setdir, name+".info"),
+               {"SetDesc"        : '"{} replicas from {} (seed {}{})"'.format(
+                                       args.nrep, args.pdf, args.seed, ", asymmetric" if args.asymmetric else ""),
+                "SetIndex"       : None,
+                "NumMembers"     : args.nrep+1,
+                "ErrorType"      : "replicas",
+                "ErrorConfLevel" : None})
+    cache = np.lib.format.open_memmap(os.path.join(setdir, name+".npy"), mode='w+',
+                                      dtype=float, shape=(args.nrep+1, layout.size))
+
+    member_file = lambda imem: os.path.join(setdir, f"{name}_{imem:04d}.dat")
+    replica_sum = np.zeros(layout.size)
+    replica_header = member_header(args.pdf, "replica")
+    rng = np.random.default_rng(args.seed)
+    executor = None
+    if (args.nproc > 1):
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=args.nproc)
+    for first in range(1, args.nrep+1, args.chunk):
+        last = min(first + args.chunk, args.nrep+1)
+        replicas = generator.replicas(rng.standard_normal((last-first, generator.neig)))
+        replica_sum += replicas.sum(axis=0)
+        cache[first:last] = replicas
+        jobs = [(member_file(imem), replica_header, layout, np.array(cache[imem])) for imem in range(first, last)]
+        if (executor is not None):
+            list(executor.map(write_member, *zip(*jobs)))
+        else:
+            for job in jobs: write_member(*job)
+    if (executor is not None): executor.shutdown()
+    cache[0] = replica_sum / args.nrep
+    write_member(member_file(0), member_header(args.pdf, "central"), layout, cache[0])
+    cache.flush()
+    print("# wrote {} replicas to {} in {:.2f}s".format(args.nrep, setdir, time.time()-start))
+
+
+if __name__ == '__main__': main()
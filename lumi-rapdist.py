@@ -13,11 +13,15 @@ def main():
 
     parser.add_argument("-rts", type=float, default=default_rts, help='Centre of mass energy (rts), in GeV')
     parser.add_argument("-mass", type=float, default=100.0, help='mass of system being produced')
+    parser.add_argument("-mass-range", type=str, default="",
+                        help='LO,HI,N: produce a (mass, rapidity) map for N masses spaced logarithmically between LO and HI')
+    parser.add_argument("-ny", type=int, default=100, help='number of rapidity bins with -mass-range')
+    parser.add_argument("-mu", type=float, default=None, help='fixed factorisation scale for -mass-range (default: mu = mass)')
     parser.add_argument("-flav1", "-flv1", type=int, default= 1, help="flavour from proton with +ve pz")
     parser.add_argument("-flav2", "-flv2", type=int, default=-1, help="flavour from proton with -ve pz")
     parser.add_argument("-eval", type=str, help="a string such as g1*g2 or sigma1*g or qqbar=2*(d1*dbar2+u1*ubar2+...)")
 
-    parser.add_argument('-out', '-o', type=str, dest="out", default="", help='Output file (default is stdout)')
+    parser.add_argument('-out', '-o', type=str, dest="out", default="", help='Output file (default is stdout); with -mass-range, a name ending in .npz gives binary output')
     parser.add_argument('-prec', type=int, default=5, help='Number of digits of precision in printout (default 5)')
 
     args = parser.parse_args()
@@ -31,6 +35,10 @@ def main():
         pdf = pdfset.mkPDF(args.imem)
 
 
+    if (args.mass_range != ""):
+        mass_map(args, pdfset, pdfs if args.err else [pdf])
+        return
+
     if (args.out != ""):
         outName = args.out
         out = open(outName,'w')
@@ -58,15 +66,54 @@ def main():
                 all_lumi_res = np.empty((len(yvals), pdfset.size))
             all_lumi_res[:,imem] = lumi_res.dlumi
         
-        lumi_res = np.empty((len(yvals)))
-        lumi_err = np.empty((len(yvals)))
-        for iy in range(len(yvals)):
-            uncert = pdfset.uncertainty(all_lumi_res[iy,:])
-            lumi_res[iy] = uncert.central
-            lumi_err[iy] = uncert.errsymm
+        uncert = bulkUncert(pdfset, all_lumi_res)
+        lumi_res = uncert.central
+        lumi_err = uncert.errsymm
 
         print(f"# rapidity", lumi.lumi_description(args.flav1,args.flav2,args.eval), "errsymm", file=out)
         print(reformat(yvals[::-1], lumi_res[::-1], lumi_err[::-1], format=format), file=out)
 
 
+def mass_map(args, pdfset, pdfs):
+    """Outputs the (mass, rapidity) map of the differential lumi, either as
+    text (one block per mass) or, if args.out ends in .npz, in binary
+    form with the arrays masses, yvals and central (plus errsymm,
+    errminus and errplus with -err), each of shape (nmass, ny)
+    """
+    mass_lo, mass_hi, nmass = args.mass_range.split(',')
+    mass_lo, mass_hi, nmass = float(mass_lo), float(mass_hi), int(nmass)
+    masses = mass_lo*(mass_hi/mass_lo)**((1.0*np.arange(0,nmass))/max(1,nmass-1))
+    # bin centres covering the rapidity range of the lightest mass
+    ymax = np.log(args.rts/masses[0])
+    yvals = -ymax + 2*ymax*(np.arange(0,args.ny) + 0.5)/args.ny
+
+    # shape (mass, y, member)
+    values = np.empty((nmass, args.ny, len(pdfs)))
+    for ipdf, pdf in enumerate(pdfs):
+        values[:,:,ipdf] = lumi.dlumi_map(pdf, masses, yvals, args.rts, args.flav1, args.flav2, args.eval, args.mu)
+
+    if args.err:
+        uncert = bulkUncert(pdfset, values)
+        results = {"central" : uncert.central, "errsymm" : uncert.errsymm,
+                   "errminus" : uncert.errminus, "errplus" : uncert.errplus}
+    else:
+        results = {"central" : values[:,:,0]}
+
+    description = lumi.lumi_description(args.flav1,args.flav2,args.eval)
+    if args.out.endswith(".npz"):
+        np.savez(args.out, masses=masses, yvals=yvals, rts=args.rts, pdf=args.pdf,
+                 dataversion=pdfset.dataversion, description=description, **results)
+        return
+
+    out = open(args.out,'w') if args.out != "" else sys.stdout
+    format="{{:<{}.{}g}}".format(args.prec+7,args.prec)
+    print("#", " ".join(sys.argv), file=out)
+    print(f"# pdf = {args.pdf}, imem = {args.imem}, rts = {args.rts}, pdf_version = {pdfset.dataversion}", file=out)
+    print("# mass rapidity", description, "errsymm" if args.err else "", file=out)
+    for im, mass in enumerate(masses):
+        columns = [results["central"][im]]
+        if args.err: columns.append(results["errsymm"][im])
+        print(reformat(np.full(args.ny, mass), yvals, *columns, format=format), file=out)
+
+
 if __name__ == '__main__': main()
\ No newline at end of file
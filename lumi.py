@@ -3,7 +3,23 @@
 # Usage:
 #
 #   ./lumi.py [-pdf PDF] [-flav1 F1] [-flav2 F2] [-eval STRING] [-mass-lo LO] [-mass-hi HI] \
-#             [-rts RTS] [-mu mu] [-err | -fullerr] [-out OUT]
+#             [-rts RTS] [-mu mu] [-err | -fullerr [-compact] [-cov FILE] [-corr FILE] [-weights FILE]] [-out OUT]
+#
+# PDF can be a comma-separated list of sets, which are then output side
+# by side, with ratios to the first one (-nproc N evaluates them in
+# parallel).
+#
+# RTS can be a comma-separated list of energies, e.g. 13000,13600,14000;
+# the lumi is then given for each, along with ratios to the first one.
+# The PDFs are then tabulated once in ln(1/x) for all energies (and, with
+# a fixed -mu, for all masses) and interpolated; -dy-table DY sets the
+# spacing, by default that of the integration nodes at the highest RTS.
+#
+# With -cov or -corr, the covariance or correlation matrix of the lumi
+# across all masses is written to FILE (in binary if FILE ends in .npy).
+#
+# With -weights FILE (as written by reweight.py), the uncertainties are
+# those of the reweighted replica set.
 #
 # If F1/=F2, then the lumi includes a factor of 2 (i.e. 2*F1*F2)
 #
@@ -13,6 +29,8 @@
 #    g1 * sigma2 (photon * all quarks)
 #    y1 * y2     (photon * photon)
 #
+# as well as x1, x2 (the momentum fractions), mu and M, e.g. u1*dbar2*(x1 > 0.01)
+#
 # The script imports python3 division, so 4/9 will be treated as floating point division
 #
 from __future__ import division
@@ -25,6 +43,7 @@ import numpy as np
 import cmdline
 from math import *
 import pdf as mypdf
+import reweight
 import lhapdf
 
 class Lumi(object):
@@ -54,12 +73,8 @@ def lumi(pdf, M, rts, iflav1, iflav2, flv_string=None, mu=None, dy_min = 0.1, ny
 
 
     if (flv_string is None):
-        pdf1 = np.zeros(ny+1)
-        pdf2 = np.zeros(ny+1)
-        for iy in range(0,ny+1):
-            x = exp(-dy*iy)
-            pdf1[iy] = pdf.xfxQ(iflav1, x, mu)
-            pdf2[iy] = pdf.xfxQ(iflav2, x, mu)
+        pdf1 = mypdf.xfxQ_array(pdf, iflav1, ll.x1vals, mu)
+        pdf2 = mypdf.xfxQ_array(pdf, iflav2, ll.x1vals, mu)
             
         ll.dlumi = pdf1[:] * pdf2[ny::-1]
         if (iflav1 != iflav2): ll.dlumi *= 2
@@ -70,65 +85,184 @@ def lumi(pdf, M, rts, iflav1, iflav2, flv_string=None, mu=None, dy_min = 0.1, ny
         # then we need a factor of two to account for
         # f_{f1/p1} * f_{f2/p2} + f_{f2/p1} * f_{f1/p2}
     else:
-        # define a range of shorthands
-        flv1 = lambda iflv: pdf.xfxQ(iflv, x1, mu)
-        flv2 = lambda iflv: pdf.xfxQ(iflv, x2, mu)
-
-        g1    = lambda : flv1(21)
-        y1    = lambda : flv1(22)
-        d1    = lambda : flv1(1)
-        u1    = lambda : flv1(2)
-        s1    = lambda : flv1(3)
-        c1    = lambda : flv1(4)
-        b1    = lambda : flv1(5)
-        t1    = lambda : flv1(6)
-        dbar1 = lambda : flv1(-1)
-        ubar1 = lambda : flv1(-2)
-        sbar1 = lambda : flv1(-3)
-        cbar1 = lambda : flv1(-4)
-        bbar1 = lambda : flv1(-5)
-        tbar1 = lambda : flv1(-6)
-
-        g2    = lambda : flv2(21)
-        y2    = lambda : flv2(22)
-        d2    = lambda : flv2(1)
-        u2    = lambda : flv2(2)
-        s2    = lambda : flv2(3)
-        c2    = lambda : flv2(4)
-        b2    = lambda : flv2(5)
-        t2    = lambda : flv2(6)
-        dbar2 = lambda : flv2(-1)
-        ubar2 = lambda : flv2(-2)
-        sbar2 = lambda : flv2(-3)
-        cbar2 = lambda : flv2(-4)
-        bbar2 = lambda : flv2(-5)
-        tbar2 = lambda : flv2(-6)
-
-        sigma1 = lambda : sum([flv1(i) + flv1(-i) for i in range(1,7)])
-        sigma2 = lambda : sum([flv2(i) + flv2(-i) for i in range(1,7)])
-        qqbar = lambda : 2*sum([flv1(i) * flv2(-i) for i in range(1,7)])
-        #d1()*dbar2() + u1()*ubar2() + s1()*sbar2() + c1()*cbar2() + b1()*bbar2() + t1()*tbar2()
-        
-        # arrange string to allow us to use the above without "()"
-        flv_string_sub = re.sub(r'([aduscbtgyr][12])',r'\1()',flv_string)
-        flv_string_sub = re.sub(r'(qqbar)',r'\1()',flv_string_sub)
-        flv_string_obj = compile(flv_string_sub, '/dev/stderr', mode='eval')
-    
-        lumi = 0
-        ll.dlumi = np.zeros(ny+1)
-        for iy in range(0,ny+1):
-            x1 = ll.x1vals[iy]
-            x2 = ll.x2vals[iy]
-            ll.dlumi[iy] = eval(flv_string_obj)
-            #lumi = lumi + eval(flv_string_obj)
-
+        # the PDFs are evaluated for all x1 (x2) values at once
+        flv1 = lambda iflv: mypdf.xfxQ_array(pdf, iflv, ll.x1vals, mu)
+        flv2 = lambda iflv: mypdf.xfxQ_array(pdf, iflv, ll.x2vals, mu)
+        ll.dlumi = channel_dlumi(flv1, flv2, iflav1, iflav2, flv_string,
+                                 {"x1": ll.x1vals, "x2": ll.x2vals, "mu": mu, "M": M})
         ll.lumi = ll.dlumi.sum() * dy            
-        #lumi *= dy
         
     if return_Lumi: return ll
     else          : return ll.lumi
     #return lumi
 
+#----------------------------------------------------------------------
+def channel_namespace(flv1, flv2):
+    """returns a dictionary with the shorthands (u1, dbar2, sigma1, qqbar,
+    ...) that can be used in -eval strings, given functions flv1(iflv) and
+    flv2(iflv) that return x*f from the protons with +ve and -ve pz (either
+    as numbers or as numpy arrays)
+    """
+    ns = {}
+    ns["g1"   ] = lambda : flv1(21)
+    ns["y1"   ] = lambda : flv1(22)
+    ns["d1"   ] = lambda : flv1(1)
+    ns["u1"   ] = lambda : flv1(2)
+    ns["s1"   ] = lambda : flv1(3)
+    ns["c1"   ] = lambda : flv1(4)
+    ns["b1"   ] = lambda : flv1(5)
+    ns["t1"   ] = lambda : flv1(6)
+    ns["dbar1"] = lambda : flv1(-1)
+    ns["ubar1"] = lambda : flv1(-2)
+    ns["sbar1"] = lambda : flv1(-3)
+    ns["cbar1"] = lambda : flv1(-4)
+    ns["bbar1"] = lambda : flv1(-5)
+    ns["tbar1"] = lambda : flv1(-6)
+
+    ns["g2"   ] = lambda : flv2(21)
+    ns["y2"   ] = lambda : flv2(22)
+    ns["d2"   ] = lambda : flv2(1)
+    ns["u2"   ] = lambda : flv2(2)
+    ns["s2"   ] = lambda : flv2(3)
+    ns["c2"   ] = lambda : flv2(4)
+    ns["b2"   ] = lambda : flv2(5)
+    ns["t2"   ] = lambda : flv2(6)
+    ns["dbar2"] = lambda : flv2(-1)
+    ns["ubar2"] = lambda : flv2(-2)
+    ns["sbar2"] = lambda : flv2(-3)
+    ns["cbar2"] = lambda : flv2(-4)
+    ns["bbar2"] = lambda : flv2(-5)
+    ns["tbar2"] = lambda : flv2(-6)
+
+    ns["sigma1"] = lambda : sum([flv1(i) + flv1(-i) for i in range(1,7)])
+    ns["sigma2"] = lambda : sum([flv2(i) + flv2(-i) for i in range(1,7)])
+    ns["qqbar"] = lambda : 2*sum([flv1(i) * flv2(-i) for i in range(1,7)])
+    #d1()*dbar2() + u1()*ubar2() + s1()*sbar2() + c1()*cbar2() + b1()*bbar2() + t1()*tbar2()
+    return ns
+
+def compile_channel(flv_string):
+    "returns the compiled form of an -eval string, for use with channel_namespace"
+    # arrange string to allow us to use the shorthands without "()"
+    flv_string_sub = re.sub(r'([aduscbtgyr][12])',r'\1()',flv_string)
+    flv_string_sub = re.sub(r'(qqbar)',r'\1()',flv_string_sub)
+    return compile(flv_string_sub, '/dev/stderr', mode='eval')
+
+def channel_dlumi(flv1, flv2, iflav1, iflav2, flv_string=None, variables=None):
+    """returns the integrand of the lumi given functions flv1(iflv) and
+    flv2(iflv) that return arrays of x*f at the x1 and x2 values; an -eval
+    string can also use the entries of variables (x1 and x2, as arrays,
+    mu and M), with math functions that act on arrays
+    """
+    if (flv_string is None):
+        dlumi = flv1(iflav1) * flv2(iflav2)
+        # if the two flavours are not identical then we need a factor of
+        # two to account for f_{f1/p1} * f_{f2/p2} + f_{f2/p1} * f_{f1/p2}
+        if (iflav1 != iflav2): dlumi *= 2
+        return dlumi
+    else:
+        namespace = mypdf.eval_namespace()
+        if (variables is not None): namespace.update(variables)
+        namespace.update(channel_namespace(flv1, flv2))
+        return eval(compile_channel(flv_string), globals(), namespace)
+
+
+#----------------------------------------------------------------------
+class LnxTable(object):
+    """\
+    x*f(x,mu) tabulated uniformly in ln(1/x), from x=1 down to
+    x=exp(-ymax), for whichever flavours are requested (each flavour is
+    evaluated the first time it is needed), with cubic interpolation
+    in ln(1/x) in between.
+    """
+    def __init__(self, pdf, mu, ymax, dy):
+        self.pdf = pdf
+        self.mu  = mu
+        self.dy  = dy
+        ny = int(ceil(ymax/dy))
+        self.xvals = np.exp(-dy*np.arange(0,ny+1))
+        self.values = {}
+
+    def xf(self, iflv, x):
+        "returns x*f(x,mu) for flavour iflv at the (array of) x values"
+        if iflv not in self.values:
+            self.values[iflv] = mypdf.xfxQ_array(self.pdf, iflv, self.xvals, self.mu)
+        return mypdf.cubic_interp_uniform(self.values[iflv], 0.0, self.dy, -np.log(x))
+
+
+def table_spacing(ymax, dy_min = 0.1, ny_min = 100):
+    """returns the spacing in ln(1/x) of the integration nodes of lumi()
+    for a range ymax = -ln(tau), the default spacing of the LnxTables
+    used with several energies: a table over the widest range then
+    contains the exact integration nodes for the highest energy
+    """
+    return ymax / max(ny_min, int(ymax/dy_min))
+
+
+def lumi_multi_rts(pdf, M, rts_list, iflav1, iflav2, flv_string=None, mu=None, dy_min = 0.1, ny_min = 100,
+                   dy_table = None, table = None):
+    """returns an array with the lumi at mass M for each of the
+    centre-of-mass energies in rts_list, obtained from a single
+    tabulation of the pdf in ln(x) covering all of them. The integration
+    is the same as in lumi(), with the PDFs interpolated from the table.
+
+    The table can be supplied (an LnxTable at scale mu covering all the
+    energies, e.g. shared between masses when mu is fixed); otherwise it
+    is built here, with spacing dy_table (by default table_spacing for
+    the highest energy).
+    """
+    if (mu is None): mu = M
+    taus = (M/np.asarray(rts_list, dtype=float))**2
+    if (table is None):
+        ymax = -log(taus.min())
+        if (dy_table is None): dy_table = table_spacing(ymax, dy_min, ny_min)
+        table = LnxTable(pdf, mu, ymax, dy_table)
+    flv1 = lambda iflv: table.xf(iflv, x1vals)
+    flv2 = lambda iflv: table.xf(iflv, x2vals)
+
+    res = np.zeros(len(taus))
+    for irts, tau in enumerate(taus):
+        if (tau >= 1.0): continue
+        ymax = -log(tau)
+        ny = max(ny_min, int(ymax/dy_min))
+        dy = ymax / ny
+        x1vals = np.exp(-dy*np.arange(0,ny+1))
+        x2vals = np.exp(-dy*(ny-np.arange(0,ny+1)))
+        res[irts] = channel_dlumi(flv1, flv2, iflav1, iflav2, flv_string,
+                                  {"x1": x1vals, "x2": x2vals, "mu": mu, "M": M}).sum() * dy
+    return res
+
+
+def dlumi_map(pdf, masses, yvals, rts, iflav1, iflav2, flv_string=None, mu=None, dy_table = 0.02):
+    """returns an array of shape (len(masses), len(yvals)) with the
+    rapidity distribution of the lumi (the dlumi of lumi(), with
+    x1,2 = M/rts*exp(+-y)), which is zero outside the kinematic range.
+    With a fixed mu, a single ln(x) tabulation (LnxTable) serves all
+    masses, unless dy_table is None; with mu = M (the default), the PDFs
+    are evaluated directly at each mass's x1 and x2 values.
+    """
+    masses = np.asarray(masses, dtype=float)
+    yvals = np.asarray(yvals, dtype=float)
+    sqrt_taus = masses/rts
+    use_table = (mu is not None and dy_table is not None)
+    if (use_table): table = LnxTable(pdf, mu, -2*log(sqrt_taus.min()), dy_table)
+
+    res = np.zeros((len(masses), len(yvals)))
+    for im,mass in enumerate(masses):
+        inside = np.abs(yvals) < -log(sqrt_taus[im])
+        x1vals = sqrt_taus[im] * np.exp( yvals[inside])
+        x2vals = sqrt_taus[im] * np.exp(-yvals[inside])
+        if (not use_table):
+            Q = mass if mu is None else mu
+            flv1 = lambda iflv: mypdf.xfxQ_array(pdf, iflv, x1vals, Q)
+            flv2 = lambda iflv: mypdf.xfxQ_array(pdf, iflv, x2vals, Q)
+        else:
+            flv1 = lambda iflv: table.xf(iflv, x1vals)
+            flv2 = lambda iflv: table.xf(iflv, x2vals)
+        res[im,inside] = channel_dlumi(flv1, flv2, iflav1, iflav2, flv_string,
+                                       {"x1": x1vals, "x2": x2vals, "mu": mass if mu is None else mu, "M": mass})
+    return res
+
+
 #----------------------------------------------------------------------
 def lumi_description(flav1,flav2,flv_string):
     if (flv_string is None):
@@ -146,12 +280,17 @@ def main():
         out = open(outName,'w')
 
     #-- get basic parameters
-    pdfname = cmdline.value("-pdf","MSHT20nnlo_as118")
+    # several comma-separated sets can be given, cf. compare_sets
+    pdfnames = cmdline.value("-pdf","MSHT20nnlo_as118").split(',')
+    pdfname = pdfnames[0]
+    nproc = cmdline.value("-nproc",1)
     flav1=cmdline.value("-flav1",21)
     flav2=cmdline.value("-flav2",21)
     flv_string = None
     if (cmdline.present("-eval")): flv_string = cmdline.value("-eval")
-    rts =cmdline.value("-rts",13000)
+    # several comma-separated energies can be given, cf. multi_rts_output
+    rts_list = [float(rts) for rts in str(cmdline.value("-rts","13000")).split(',')]
+    rts = rts_list[0]
     mass_lo = cmdline.value("-mass-lo",125.0)
     mass_hi = cmdline.value("-mass-hi",rts/2.0)
     nmass = cmdline.value("-nmass",50)
@@ -167,6 +306,13 @@ def main():
     else        :
         imem = 0
         medianerr = cmdline.present("-medianerr")
+    # replica weights from reweight.py
+    weights_file = cmdline.value("-weights","")
+    # store members as float32 differences from member 0
+    compact = cmdline.present("-compact")
+    # files for the covariance and correlation matrices over the masses
+    cov_file  = cmdline.value("-cov","")
+    corr_file = cmdline.value("-corr","")
 
     print_info=cmdline.present("-info")
 
@@ -174,15 +320,22 @@ def main():
 
     mu = None
     if (cmdline.present("-mu")): mu = cmdline.value("-mu", return_type=float)
+    # ln(1/x) spacing of the PDF tables used with several -rts values
+    dy_table = None
+    if (cmdline.present("-dy-table")): dy_table = cmdline.value("-dy-table", return_type=float)
 
     cmdline.assert_all_options_used()
 
     # now set up the pdf
     pdfset = lhapdf.getPDFSet(pdfname)
+    weights = None
+    if (weights_file != ""):
+        if (len(pdfnames) > 1): raise ValueError("-weights cannot be used when comparing several sets")
+        weights = reweight.read_weights(weights_file, pdfset)
 
     # make sure our lumi mass range is in the PDF range
     xMin = pdfset.mkPDF(imem).xMin
-    mass_lo = max(mass_lo, sqrt(xMin) * rts)
+    mass_lo = max(mass_lo, sqrt(xMin) * max(rts_list))
 
 
     #======================================================================
@@ -196,9 +349,23 @@ def main():
 
 
 
-    if (err):
+    if (len(pdfnames) > 1):
+        for option, used in (("-compact", compact), ("-cov", cov_file != ""), ("-corr", corr_file != "")):
+            if (used): raise ValueError(option+" cannot be used when comparing several sets")
+        if (len(rts_list) > 1):
+            raise ValueError("several -rts values cannot be used when comparing several sets (got -rts {})".format(
+                ",".join([str(rts) for rts in rts_list])))
+        compare_sets(out, pdfnames, masses, norm, rts, flav1, flav2, flv_string, mu, dy_min,
+                     err, fullerr, err and medianerr, imem, nproc)
+
+    elif (len(rts_list) > 1):
+        pdfs = pdfset.mkPDFs() if err else [pdfset.mkPDF(imem)]
+        multi_rts_output(out, pdfset, pdfs, masses, norm, rts_list, flav1, flav2, flv_string, mu, dy_min,
+                         err, fullerr, err and medianerr, compact, weights, dy_table)
 
-        resfull=np.empty([nmass,pdfset.size])
+    elif (err):
+
+        resfull=mypdf.member_array([nmass], pdfset.size, compact)
         if (fullerr):
             ncol=4
         else:
@@ -209,7 +376,9 @@ def main():
         for im,mass in enumerate(masses):
             for ipdf,pdf in enumerate(pdfs):
                 resfull[im,ipdf] = norm[im] * lumi(pdf, mass, rts, flav1, flav2, flv_string, mu, dy_min)
-            if (medianerr):
+            if (weights is not None):
+                uncert = mypdf.bulkUncert(pdfset, resfull[im,:], medianerr, weights)
+            elif (medianerr):
                 uncert = mypdf.intervalUncert(resfull[im,:])
             else:
                 uncert = pdfset.uncertainty(resfull[im,:])
@@ -230,6 +399,10 @@ def main():
         print(header, file=out)
         print(mypdf.reformat(masses, reserr, format='{:<13.6g}'), file=out)
 
+        if (cov_file or corr_file):
+            labels = ["mass={:.6g}".format(mass) for mass in masses]
+            mypdf.write_cov_corr(pdfset, resfull, labels, cov_file, corr_file, weights)
+
     else:
         pdf=pdfset.mkPDF(imem)
         res=np.empty([nmass])
@@ -244,6 +417,102 @@ def main():
 
     if (print_info): printInfo()
 
+#----------------------------------------------------------------------
+def evaluate_set(pdfname, masses, norm, rts, flav1, flav2, flv_string, mu, dy_min, err, medianerr, imem):
+    """returns a tuple (central, errsymm, errminus, errplus) of arrays of
+    shape (len(masses), 1) with the lumi for the set pdfname; the
+    uncertainty follows the set's own convention, with medianerr applied
+    only to replica sets. Without err, the errors are None.
+    """
+    pdfset = lhapdf.getPDFSet(pdfname)
+    pdfs = pdfset.mkPDFs() if err else [pdfset.mkPDF(imem)]
+    values = np.empty((len(masses), 1, len(pdfs)))
+    for ipdf,pdf in enumerate(pdfs):
+        for im,mass in enumerate(masses):
+            values[im,0,ipdf] = norm[im] * lumi(pdf, mass, rts, flav1, flav2, flv_string, mu, dy_min)
+    if (not err): return values[:,:,0], None, None, None
+
+    uncert = mypdf.bulkUncert(pdfset, values, medianerr and pdfset.errorType == "replicas")
+    return uncert.central, uncert.errsymm, uncert.errminus, uncert.errplus
+
+def compare_sets(out, pdfnames, masses, norm, rts, flav1, flav2, flv_string, mu, dy_min,
+                 err, fullerr, medianerr, imem, nproc):
+    """prints the lumi for each of the sets side by side, with ratios to
+    the first set; the sets are evaluated at the same masses, in
+    parallel if nproc > 1
+    """
+    jobs = [(pdfname, masses, norm, rts, flav1, flav2, flv_string, mu, dy_min, err, medianerr, imem)
+            for pdfname in pdfnames]
+    if (nproc > 1):
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=nproc) as executor:
+            results = list(executor.map(evaluate_set, *zip(*jobs)))
+    else:
+        results = [evaluate_set(*job) for job in jobs]
+
+    versions = ",".join([str(lhapdf.getPDFSet(pdfname).dataversion) for pdfname in pdfnames])
+    print("# pdfs = {}, versions = {}, rts = {}".format(",".join(pdfnames), versions, rts), file=out)
+    header, columns = mypdf.comparison_columns(pdfnames, results, [lumi_description(flav1,flav2,flv_string)], err, fullerr)
+    print("# Columns: mass"+header, file=out)
+    print(mypdf.reformat(masses, np.array(columns).T, format='{:<13.6g}'), file=out)
+
+#----------------------------------------------------------------------
+def multi_rts_output(out, pdfset, pdfs, masses, norm, rts_list, flav1, flav2, flv_string, mu, dy_min,
+                     err, fullerr, medianerr, compact, weights = None, dy_table = None):
+    """prints the lumi for each of the energies in rts_list, followed by
+    its ratio to the lumi at rts_list[0]; the PDFs for each member are
+    tabulated just once per mass or, with a fixed mu, just once for all
+    masses (cf. lumi_multi_rts, which also explains dy_table), and the
+    uncertainties on the ratios are obtained member by member (with the
+    replica weights of reweight.py, if given)
+    """
+    nrts = len(rts_list)
+    resfull = mypdf.member_array([len(masses), nrts], len(pdfs), compact)
+    # with a fixed mu, one table covers the lowest mass at the highest energy
+    ymax = -2*log(min(masses)/max(rts_list))
+    if (mu is not None and dy_table is None): dy_table = table_spacing(ymax, dy_min)
+    for ipdf,pdf in enumerate(pdfs):
+        table = LnxTable(pdf, mu, ymax, dy_table) if (mu is not None) else None
+        for im,mass in enumerate(masses):
+            resfull[im,:,ipdf] = norm[im] * lumi_multi_rts(pdf, mass, rts_list, flav1, flav2, flv_string, mu, dy_min,
+                                                           dy_table = dy_table, table = table)
+    # one mass at a time, so that with compact storage the members are
+    # never all held in double precision
+    nquantity = 2*nrts-1
+    central, errsymm, errminus, errplus = [np.empty((len(masses), nquantity)) for i in range(4)]
+    for im in range(len(masses)):
+        values = resfull[im,:,:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            quantity = np.concatenate((values, values[1:,:] / values[0:1,:]))
+        if (err):
+            uncert = mypdf.bulkUncert(pdfset, quantity, medianerr, weights)
+            central[im], errsymm[im], errminus[im], errplus[im] = (
+                uncert.central, uncert.errsymm, uncert.errminus, uncert.errplus)
+        else:
+            central[im] = quantity[:,0]
+
+    description = lumi_description(flav1,flav2,flv_string)
+    labels = (["{}@rts={}".format(description, rts) for rts in rts_list]
+              + ["ratio(rts={}/rts={})".format(rts, rts_list[0]) for rts in rts_list[1:]])
+    header = "# Columns: mass"
+    columns = []
+    for i,label in enumerate(labels):
+        if (err):
+            header += " "+label+" : mean_or_median errsymm"
+            columns += [central[:,i], errsymm[:,i]]
+            if (fullerr):
+                header += " bandlo bandhi"
+                columns += [central[:,i]-np.abs(errminus[:,i]), central[:,i]+errplus[:,i]]
+        else:
+            header += " "+label+": central"
+            columns += [central[:,i]]
+
+    rts_string = ",".join([str(rts) for rts in rts_list])
+    if (err): print("# pdf = {}, version = {}, rts = {}".format(pdfset.name, pdfset.dataversion, rts_string), file=out)
+    else    : print("# pdf = {}, imem = {}, version = {}, rts = {}".format(pdfset.name, pdfs[0].memberID, pdfset.dataversion, rts_string), file=out)
+    print(header, file=out)
+    print(mypdf.reformat(masses, np.array(columns).T, format='{:<13.6g}'), file=out)
+
 def printInfo():
     # find out location of data
     lhapdfData = subprocess.Popen(["lhapdf-config", "--datadir"],
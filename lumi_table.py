@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Precomputed luminosity tables, with fast interpolated lookup. Usage:
+
+  to build a table (one or all members) with lumi.lumi()
+
+    ./lumi_table.py -build TABLE.npz [-pdf PDF] [-channels gg,qqbar,qg,'u1*dbar2'] \\
+                    [-rts 13000,13600,14000] [-xi 0.5,1,2] [-mass-lo LO] [-mass-hi HI] [-nmass N] [-err]
+
+  to look up a mass scan, with the same output as lumi.py
+
+    ./lumi_table.py -table TABLE.npz [-channel gg] [-rts RTS] [-xi XI] \\
+                    [-mass-lo LO] [-mass-hi HI] [-nmass N] [-err | -fullerr] [-out OUT]
+
+The luminosities are stored (in single precision) on a grid uniform in
+ln(M), for each channel, rts, xi = mu/M and member. The lookup uses cubic
+interpolation in ln(M) (of ln(lumi), when the lumi is positive); at
+build time the interpolation is checked against direct integration
+at the mid-points of the grid, and the largest relative deviation is
+stored with the table and reported on lookup.
+"""
+import argparse
+from math import log, sqrt
+from pdf_base import *
+import lumi
+
+# shorthands for the standard channels, in the -eval syntax of lumi.py
+standard_channels = {
+    "gg"    : "g1*g2",
+    "qqbar" : "qqbar",
+    "qg"    : "sigma1*g2 + g1*sigma2",
+    }
+
+
+#----------------------------------------------------------------------
+class LumiTable(object):
+    """\
+    A table of luminosities, shape (channel, rts, xi, member, mass), with
+    the mass grid uniform in ln(M) starting at lnM0 with spacing dlnM.
+    """
+    def __init__(self, pdfname, dataversion, channels, evals, rts, xi, lnM0, dlnM, values, accuracy=None):
+        self.pdfname = pdfname
+        self.dataversion = dataversion
+        self.channels = list(channels)
+        self.evals = list(evals)
+        self.rts = np.asarray(rts, dtype=float)
+        self.xi = np.asarray(xi, dtype=float)
+        self.lnM0 = lnM0
+        self.dlnM = dlnM
+        self.values = values
+        # interpolate ln(lumi) for channels that are positive throughout
+        self.positive = np.array([np.all(values[ich] > 0) for ich in range(len(self.channels))])
+        self.accuracy = accuracy
+
+    @property
+    def masses(self):
+        return np.exp(self.lnM0 + self.dlnM*np.arange(self.values.shape[-1]))
+
+    def save(self, filename):
+        np.savez_compressed(filename, pdfname=self.pdfname, dataversion=self.dataversion,
+                            channels=np.array(self.channels), evals=np.array(self.evals),
+                            rts=self.rts, xi=self.xi, lnM0=self.lnM0, dlnM=self.dlnM,
+                            values=self.values, accuracy=self.accuracy)
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as data:
+            return cls(str(data["pdfname"]), int(data["dataversion"]),
+                       [str(ch) for ch in data["channels"]], [str(ev) for ev in data["evals"]],
+                       data["rts"], data["xi"], float(data["lnM0"]), float(data["dlnM"]),
+                       data["values"], data["accuracy"])
+
+    def index(self, channel, rts, xi):
+        "returns the (channel, rts, xi) indices in the table, or raises a ValueError"
+        channel = standard_channels.get(channel, channel)
+        if channel not in self.evals: raise ValueError(f"channel {channel} is not in the table")
+        irts = np.nonzero(np.abs(self.rts/rts - 1) < 1e-9)[0]
+        ixi  = np.nonzero(np.abs(self.xi/xi - 1) < 1e-9)[0]
+        if len(irts) == 0: raise ValueError(f"rts = {rts} is not in the table (available: {self.rts})")
+        if len(ixi)  == 0: raise ValueError(f"xi = {xi} is not in the table (available: {self.xi})")
+        return self.evals.index(channel), irts[0], ixi[0]
+
+    def lumi(self, channel, masses, rts, xi = 1.0):
+        """returns an array of shape (member, len(masses)) with the
+        interpolated luminosity at each of the masses
+        """
+        ich, irts, ixi = self.index(channel, rts, xi)
+        lnM = np.log(masses)
+        if (np.any(lnM < self.lnM0 - 1e-9) or np.any(lnM > self.lnM0 + self.dlnM*(self.values.shape[-1]-1) + 1e-9)):
+            raise ValueError("requested masses are outside the tabulated range")
+        values = self.values[ich,irts,ixi]
+        if self.positive[ich]:
+            return np.exp(cubic_interp_uniform(np.log(values), self.lnM0, self.dlnM, lnM))
+        else:
+            return cubic_interp_uniform(values, self.lnM0, self.dlnM, lnM)
+
+
+#----------------------------------------------------------------------
+def build(pdfset, pdfs, channels, rts_list, xi_list, mass_lo, mass_hi, nmass, dy_min = 0.1):
+    """returns a LumiTable for the given pdfs (members of pdfset), with
+    channels a list of names from standard_channels or -eval strings
+    """
+    evals = [standard_channels.get(ch, ch) for ch in channels]
+    lnM0 = log(mass_lo)
+    dlnM = (log(mass_hi) - lnM0) / (nmass-1)
+    masses = np.exp(lnM0 + dlnM*np.arange(nmass))
+
+    values = np.empty((len(evals), len(rts_list), len(xi_list), len(pdfs), nmass))
+    for ich, ev in enumerate(evals):
+        for irts, rts in enumerate(rts_list):
+            for ixi, xi in enumerate(xi_list):
+                for ipdf, pdf in enumerate(pdfs):
+                    for im, mass in enumerate(masses):
+                        values[ich,irts,ixi,ipdf,im] = lumi.lumi(pdf, mass, rts, 0, 0, ev, xi*mass, dy_min)
+
+    table = LumiTable(pdfset.name, pdfset.dataversion, channels, evals, rts_list, xi_list,
+                      lnM0, dlnM, values.astype(np.float32))
+
+    # accuracy bounds from direct integration (central member) at the
+    # mid-points of the mass grid, where the interpolation is worst
+    mid_masses = np.exp(lnM0 + dlnM*(np.arange(nmass-1) + 0.5))
+    accuracy = np.empty((len(evals), len(rts_list), len(xi_list)))
+    for ich, ev in enumerate(evals):
+        for irts, rts in enumerate(rts_list):
+            for ixi, xi in enumerate(xi_list):
+                direct = np.array([lumi.lumi(pdfs[0], mass, rts, 0, 0, ev, xi*mass, dy_min) for mass in mid_masses])
+                interp = table.lumi(ev, mid_masses, rts, xi)[0]
+                accuracy[ich,irts,ixi] = np.max(np.abs(interp/direct - 1))
+    table.accuracy = accuracy
+    return table
+
+
+#----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='Build or look up tabulated luminosities')
+    parser.add_argument('-build', type=str, default="", help='Build a table and write it to this (.npz) file')
+    parser.add_argument('-table', type=str, default="", help='Look up luminosities from this table')
+
+    parser.add_argument('-pdf', type=str, default=default_pdf, help='PDF name (for -build)')
+    parser.add_argument('-imem', type=int, default=0, help='The member to tabulate (for -build without -err)')
+    parser.add_argument('-err', action='store_true', help='Tabulate all members / output the symm err')
+    parser.add_argument('-fullerr', action='store_true', help='Output the full error info')
+    parser.add_argument('-medianerr', action='store_true', help='use a median + interval uncertainty')
+
+    parser.add_argument('-channels', type=str, default="gg,qqbar,qg",
+                        help='Comma-separated channels to tabulate: '+",".join(standard_channels)+' or -eval strings of lumi.py')
+    parser.add_argument('-channel', type=str, default="gg", help='Channel to look up')
+    parser.add_argument('-rts', type=str, default=str(default_rts), help='(Comma-separated) centre-of-mass energies, in GeV')
+    parser.add_argument('-xi', type=str, default="1.0", help='(Comma-separated) values of mu/M')
+    parser.add_argument('-mass-lo', type=float, default=10.0, help='Lowest mass')
+    parser.add_argument('-mass-hi', type=float, default=None, help='Highest mass (default: rts/2)')
+    parser.add_argument('-nmass', type=int, default=None, help='Number of masses (default: 200 for -build, 50 for lookup)')
+    parser.add_argument('-dy-min', type=float, default=0.1, help='Maximum rapidity spacing for the direct integration')
+
+    parser.add_argument('-out', '-o', type=str, dest="out", default="", help='Output file (default is stdout)')
+    parser.add_argument('-prec', type=int, default=6, help='Number of digits of precision in printout (default 6)')
+
+    args = parser.parse_args()
+    err = args.err or args.fullerr
+    rts_list = [float(rts) for rts in args.rts.split(',')]
+    xi_list  = [float(xi)  for xi  in args.xi.split(',')]
+
+    if (args.build != ""):
+        pdfset = lhapdf.getPDFSet(args.pdf)
+        pdfs = pdfset.mkPDFs() if err else [pdfset.mkPDF(args.imem)]
+        mass_hi = args.mass_hi if args.mass_hi is not None else min(rts_list)/2.0
+        mass_lo = max(args.mass_lo, sqrt(pdfs[0].xMin) * max(rts_list))
+        nmass = args.nmass if args.nmass is not None else 200
+        table = build(pdfset, pdfs, args.channels.split(','), rts_list, xi_list, mass_lo, mass_hi, nmass, args.dy_min)
+        table.save(args.build)
+        for ich, channel in enumerate(table.channels):
+            print(f"# {channel}: max relative interpolation error = {table.accuracy[ich].max():.3g}")
+        return
+
+    if (args.table == ""):
+        parser.error("one of -build or -table must be given")
+
+    if (args.out != ""):
+        out = open(args.out,'w')
+    else:
+        out = sys.stdout
+    format="{{:<{}.{}g}}".format(args.prec+7,args.prec)
+
+    table = LumiTable.load(args.table)
+    rts, xi = rts_list[0], xi_list[0]
+    tab_masses = table.masses
+    mass_lo = max(args.mass_lo, tab_masses[0])
+    mass_hi = min(args.mass_hi if args.mass_hi is not None else rts/2.0, tab_masses[-1])
+    nmass = args.nmass if args.nmass is not None else 50
+    masses = mass_lo*(mass_hi/mass_lo)**((1.0*np.arange(0,nmass))/max(1,nmass-1))
+
+    res = table.lumi(args.channel, masses, rts, xi)
+    ich, irts, ixi = table.index(args.channel, rts, xi)
+
+    print("# "+" ".join(sys.argv), file=out)
+    print("# pdf = {}, version = {}, rts = {}, mu/M = {}".format(table.pdfname, table.dataversion, rts, xi), file=out)
+    print("# max relative interpolation error (vs direct integration) = {:.3g}".format(table.accuracy[ich,irts,ixi]), file=out)
+    description = "lumi({})".format(table.evals[ich])
+    if (err):
+        if (res.shape[0] == 1): raise ValueError("the table contains a single member; rebuild it with -err")
+        uncert = bulkUncert(lhapdf.getPDFSet(table.pdfname), res.T, args.medianerr)
+        columns = [uncert.central, uncert.errsymm]
+        header = "# Columns: mass "+description+" : mean_or_median errsymm"
+        if (args.fullerr):
+            columns += [uncert.central-np.abs(uncert.errminus), uncert.central+uncert.errplus]
+            header += " bandlo bandhi"
+        print(header, file=out)
+        print(reformat(masses, np.array(columns).T, format=format), file=out)
+    else:
+        print("# Columns: mass "+description+": central", file=out)
+        print(reformat(masses, res[0], format=format), file=out)
+
+
+if __name__ == '__main__': main()
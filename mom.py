@@ -3,12 +3,19 @@
 # Usage:
 #
 #   ./mom.py [-pdf PDF] [-flav iflv]  [-Q-lo LO] [-Q-hi HI] [-nQ N] \
-#            [{-err | -fullerr} [-do-latex]] [-out OUT]
+#            [{-err | -fullerr} [-do-latex] [-compact] [-cov FILE] [-corr FILE] [-weights FILE]] [-out OUT]
+#
+# -cov and -corr write the covariance or correlation matrix across all
+# Q values and flavours to FILE (in binary if FILE ends in .npy)
+#
+# -weights FILE (as written by reweight.py) gives the uncertainties of
+# the reweighted replica set
+#
+# For moments other than the momentum fraction, complex N, or many
+# moments at once, see moments.py
 #
-# 
 from __future__ import division
 from __future__ import print_function
-from builtins import range
 import sys
 import subprocess
 #import hfile # you may need to add ../aux to your path to get it (cf below for lhapdfPath)
@@ -23,159 +30,178 @@ from math import *
 # include it in the python path
 #sys.path = [lhapdfPath] + sys.path
 #sys.path.append(lhapdfPath)
-import lhapdf
+from pdf_base import lhapdf
 import pdf as mypdf
+import reweight
 
-out = sys.stdout
-
-myEval= cmdline.value("-eval","")
 
+#----------------------------------------------------------------------
+def mom_grid(ymax, dy_min = 0.1, ny_min = 100):
+    """returns the x values, uniformly spaced in ln(1/x) between 0 and
+    ymax, and the spacing dy that are used for the moment integrals
+    """
+    ny = max(ny_min, int(ymax/dy_min))
+    dy = ymax/ny
+    return np.exp(-dy*np.arange(0,ny+1)), dy
 
 #----------------------------------------------------------------------
-def mom(pdf, Q, iflav, xmin = None):
+def mom(pdf, Q, iflav, xmin = None, flv_string = None, dy_min = 0.1, ny_min = 100):
     if (xmin is None):
         ymax = -log(pdf.xMin)
     else:
         ymax = -log(xmin)
-    # these settings should be accurate enough for most
+    # the default settings should be accurate enough for most
     # purposes
-    dy_min = 0.1
-    ny_min = 100
-    ny = max(ny_min, int(ymax/dy_min))
-    dy = ymax/ny
+    xvals, dy = mom_grid(ymax, dy_min, ny_min)
     flv = lambda iflav: pdf.xfxQ(int(iflav), x, Q)
-    
-    x_pdf = np.zeros(ny+1)
-    for iy in range(0,ny+1):
-        x = exp(-dy*iy)
-        if (myEval): x_pdf[iy] = x * eval(myEval)
-        else:        x_pdf[iy] = x * pdf.xfxQ(iflav, x, Q)
-        
+
+    x_pdf = np.zeros(len(xvals))
+    for iy,x in enumerate(xvals):
+        if (flv_string): x_pdf[iy] = x * eval(flv_string)
+        else:            x_pdf[iy] = x * pdf.xfxQ(iflav, x, Q)
+
     mom = x_pdf.sum() * dy
     return mom
-    
-#-- send output to a file if requested
-if (cmdline.present("-out")):
-    outName = cmdline.value("-out")
-    out = open(outName,'w')
 
-#-- get basic parameters
-pdfname = cmdline.value("-pdf","MSHT20nnlo_as118")
-#flav=cmdline.value("-flav",21)
-Q_lo = cmdline.value("-Q-lo",10.0)
-Q_hi = cmdline.value("-Q-hi",10000.0)
-nQ = cmdline.value("-nQ",50)
 
-doLaTeX=cmdline.present("-do-latex")
+def main():
+    out = sys.stdout
 
-if (cmdline.present("-xmin")): xmin = cmdline.value("-xmin", return_type = float)
-else                         : xmin = None
+    myEval= cmdline.value("-eval","")
 
-#nx=cmdline.value("-nx",100)
-#Q=cmdline.value("-Q", 100.0)
-flavList=cmdline.value("-flav",'1').split(',')
-for iflav,flav in enumerate(flavList):
-    flavList[iflav] = int(flav)
-fullerr = cmdline.present("-fullerr")
-err = cmdline.present("-err") or fullerr
-if (not err):
-    imem = cmdline.value("-imem",0)
-else        :
-    imem = 0
-    medianerr = cmdline.present("-medianerr")
+    #-- send output to a file if requested
+    if (cmdline.present("-out")):
+        outName = cmdline.value("-out")
+        out = open(outName,'w')
 
-print_info=cmdline.present("-info")
+    #-- get basic parameters
+    pdfname = cmdline.value("-pdf","MSHT20nnlo_as118")
+    #flav=cmdline.value("-flav",21)
+    Q_lo = cmdline.value("-Q-lo",10.0)
+    Q_hi = cmdline.value("-Q-hi",10000.0)
+    nQ = cmdline.value("-nQ",50)
 
-divide_by_M2 = cmdline.present("-divide-by-M2")
+    doLaTeX=cmdline.present("-do-latex")
 
-mu = None
-if (cmdline.present("-mu")): mu = cmdline.value("-mu", return_type=float)
+    if (cmdline.present("-xmin")): xmin = cmdline.value("-xmin", return_type = float)
+    else                         : xmin = None
 
-cmdline.assert_all_options_used()
+    #nx=cmdline.value("-nx",100)
+    #Q=cmdline.value("-Q", 100.0)
+    flavList=cmdline.value("-flav",'1').split(',')
+    for iflav,flav in enumerate(flavList):
+        flavList[iflav] = int(flav)
+    fullerr = cmdline.present("-fullerr")
+    err = cmdline.present("-err") or fullerr
+    if (not err):
+        imem = cmdline.value("-imem",0)
+    else        :
+        imem = 0
+        medianerr = cmdline.present("-medianerr")
+    # replica weights from reweight.py
+    weights_file = cmdline.value("-weights","")
+    # store members as float32 differences from member 0
+    compact = cmdline.present("-compact")
+    # files for the covariance and correlation matrices over Q and flavours
+    cov_file  = cmdline.value("-cov","")
+    corr_file = cmdline.value("-corr","")
 
-# now set up the pdf
-pdfset = lhapdf.getPDFSet(pdfname)
+    print_info=cmdline.present("-info")
 
-# make sure our lumi mass range is in the PDF range
-QMin = sqrt(pdfset.mkPDF(imem).q2Min)
-Q_lo = max(Q_lo, QMin)
+    cmdline.assert_all_options_used()
 
+    # now set up the pdf
+    pdfset = lhapdf.getPDFSet(pdfname)
+    weights = reweight.read_weights(weights_file, pdfset) if (weights_file != "") else None
 
-#======================================================================
-# now start with the output
-print("# "+cmdline.cmdline(), file=out)        
+    # make sure our lumi mass range is in the PDF range
+    QMin = sqrt(pdfset.mkPDF(imem).q2Min)
+    Q_lo = max(Q_lo, QMin)
 
-# generate the Qvals
-Qvals=Q_lo*(Q_hi/Q_lo)**((1.0*np.arange(0,nQ))/(max(1,nQ-1)))
 
+    #======================================================================
+    # now start with the output
+    print("# "+cmdline.cmdline(), file=out)
 
-if (err):
+    # generate the Qvals
+    Qvals=Q_lo*(Q_hi/Q_lo)**((1.0*np.arange(0,nQ))/(max(1,nQ-1)))
 
-    resfull=np.empty([nQ,len(flavList),pdfset.size])
-    if (fullerr):
-        ncol=4
-    else:
-        ncol=2
-    reserr=np.empty([nQ,ncol*len(flavList)])
-
-    pdfs = pdfset.mkPDFs()
-    for iQ,Q in enumerate(Qvals):
-        for iflav,flav in enumerate(flavList):
-            for ipdf,pdf in enumerate(pdfs):
-                resfull[iQ,iflav,ipdf] = mom(pdf, Q, flav, xmin)
-            if (medianerr):
-                uncert = mypdf.intervalUncert(resfull[iQ,iflav,:])
-            else:
-                uncert = pdfset.uncertainty(resfull[iQ,iflav,:])
-
-            reserr[iQ,iflav*ncol+0] = uncert.central
-            reserr[iQ,iflav*ncol+1] = uncert.errsymm
-            if (fullerr):
-                reserr[iQ,iflav*ncol+2] = uncert.central-abs(uncert.errminus)
-                reserr[iQ,iflav*ncol+3] = uncert.central+uncert.errplus
-
-    print("# pdf = {}, version = {}".format(pdfname, pdfset.dataversion), file=out)
-    header = "# Columns: Q"
-    for flav in flavList:
-        header += " mom({}) errsymm({})".format(flav,flav)
-        if (fullerr): header += " bandlo({}) bandhi({})".format(flav,flav)
-    if (fullerr): header += " bandlo bandhi"
-    print(header, file=out)
-    print(mypdf.reformat(Qvals, reserr, format='{:<12.5g}'), file=out)
-
-    if (doLaTeX):
-        print("{:8s}".format("Q [GeV]"), end=' ', file=out)
-        for iflav,flav in enumerate(flavList):
-            print("& {:17s}".format(mypdf.names[flav]), end=' ', file=out)
-        print(r"\\", file=out)
+
+    if (err):
+
+        resfull=mypdf.member_array([nQ,len(flavList)], pdfset.size, compact)
+        if (fullerr):
+            ncol=4
+        else:
+            ncol=2
+        reserr=np.empty([nQ,ncol*len(flavList)])
+
+        pdfs = pdfset.mkPDFs()
         for iQ,Q in enumerate(Qvals):
-            print("{:8.1f}".format(Q), end=' ', file=out)
             for iflav,flav in enumerate(flavList):
-                print(r"& ${:5.2f} \pm {:5.2f}$".format(100*reserr[iQ,iflav*ncol+0],
-                                                              100*reserr[iQ,iflav*ncol+1]), end=' ', file=out)
+                for ipdf,pdf in enumerate(pdfs):
+                    resfull[iQ,iflav,ipdf] = mom(pdf, Q, flav, xmin, myEval)
+                if (weights is not None):
+                    uncert = mypdf.bulkUncert(pdfset, resfull[iQ,iflav,:], medianerr, weights)
+                elif (medianerr):
+                    uncert = mypdf.intervalUncert(resfull[iQ,iflav,:])
+                else:
+                    uncert = pdfset.uncertainty(resfull[iQ,iflav,:])
+
+                reserr[iQ,iflav*ncol+0] = uncert.central
+                reserr[iQ,iflav*ncol+1] = uncert.errsymm
+                if (fullerr):
+                    reserr[iQ,iflav*ncol+2] = uncert.central-abs(uncert.errminus)
+                    reserr[iQ,iflav*ncol+3] = uncert.central+uncert.errplus
+
+        print("# pdf = {}, version = {}".format(pdfname, pdfset.dataversion), file=out)
+        header = "# Columns: Q"
+        for flav in flavList:
+            header += " mom({}) errsymm({})".format(flav,flav)
+            if (fullerr): header += " bandlo({}) bandhi({})".format(flav,flav)
+        if (fullerr): header += " bandlo bandhi"
+        print(header, file=out)
+        print(mypdf.reformat(Qvals, reserr, format='{:<12.5g}'), file=out)
+
+        # rows ordered with the flavour varying fastest
+        if (cov_file or corr_file):
+            labels = ["Q={:.6g},flav={}".format(Q,flav) for Q in Qvals for flav in flavList]
+            mypdf.write_cov_corr(pdfset, resfull.reshape(nQ*len(flavList), pdfset.size), labels, cov_file, corr_file, weights)
+
+        if (doLaTeX):
+            print("{:8s}".format("Q [GeV]"), end=' ', file=out)
+            for iflav,flav in enumerate(flavList):
+                print("& {:17s}".format(mypdf.names[flav]), end=' ', file=out)
             print(r"\\", file=out)
-    
-else:
-    pdf=pdfset.mkPDF(imem)
-    res=np.empty([nQ,len(flavList)])
-    for iQ,Q in enumerate(Qvals):
-        for iflav,flav in enumerate(flavList):
-            res[iQ,iflav] = mom(pdf, Q, flav, xmin)
-    
-    print("# pdf = {}, imem = {}, version = {}".format(pdfname,imem, pdfset.dataversion), file=out)
-    header = "# Columns: Q"
-    for flav in flavList:
-        header += " mom({}): central".format(flav)
-    print(header, file=out)
-    print(mypdf.reformat(Qvals, res, format='{:<12.5g}'), file=out)
-
-
-def printInfo():
+            for iQ,Q in enumerate(Qvals):
+                print("{:8.1f}".format(Q), end=' ', file=out)
+                for iflav,flav in enumerate(flavList):
+                    print(r"& ${:5.2f} \pm {:5.2f}$".format(100*reserr[iQ,iflav*ncol+0],
+                                                                  100*reserr[iQ,iflav*ncol+1]), end=' ', file=out)
+                print(r"\\", file=out)
+
+    else:
+        pdf=pdfset.mkPDF(imem)
+        res=np.empty([nQ,len(flavList)])
+        for iQ,Q in enumerate(Qvals):
+            for iflav,flav in enumerate(flavList):
+                res[iQ,iflav] = mom(pdf, Q, flav, xmin, myEval)
+
+        print("# pdf = {}, imem = {}, version = {}".format(pdfname,imem, pdfset.dataversion), file=out)
+        header = "# Columns: Q"
+        for flav in flavList:
+            header += " mom({}): central".format(flav)
+        print(header, file=out)
+        print(mypdf.reformat(Qvals, res, format='{:<12.5g}'), file=out)
+
+    if (print_info): printInfo(pdfname, out)
+
+
+def printInfo(pdfname, out):
     # find out location of data
     lhapdfData = subprocess.Popen(["lhapdf-config", "--datadir"],
-                                  stdout=subprocess.PIPE).communicate()[0].rstrip()
+                                  stdout=subprocess.PIPE).communicate()[0].decode('utf-8').rstrip()
     print(subprocess.Popen(["cat", "{0}/{1}/{1}.info".format(lhapdfData,pdfname)],
-                                  stdout=subprocess.PIPE).communicate()[0], file=out)
-
-if (print_info): printInfo()
+                                  stdout=subprocess.PIPE).communicate()[0].decode('utf-8'), file=out)
 
+if __name__ == '__main__': main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Batched Mellin moments <x^(N-1)> = int_0^1 dx x^(N-1) f(x,Q) of PDFs. Usage:
+
+    ./moments.py [-pdf PDF] [-N 1,2,...] [-flav 21,2,...] [-eval STRINGS] \\
+                 [-Q-lo LO] [-Q-hi HI] [-nQ N] [-xmin XMIN] [-err | -fullerr] [-out OUT]
+
+Each member is evaluated just once, on the ln(1/x) grid of mom.py, for
+all flavours and Q values. The moments for all N then follow from a
+single product with an (N, x) weight matrix, and the uncertainties are
+obtained for all of them at once. With N=2 the results coincide with
+those of mom.py.
+
+N can be complex, e.g. -N 1.5+2j, or can be taken along a contour
+N = C + t*exp(i*PHI), 0 <= t <= TMAX, with -contour C,PHI,TMAX,NT
+"""
+import argparse
+from math import log, cos, sin, sqrt
+from pdf_base import *
+import mom
+
+
+#----------------------------------------------------------------------
+def mellin_contour(c, phi, tmax, nt):
+    """returns nt values of N = c + t*exp(i*phi), with 0 <= t <= tmax"""
+    tvals = tmax * np.arange(0,nt) / max(1,nt-1)
+    return c + tvals * complex(cos(phi), sin(phi))
+
+
+def mellin_weights(Nvals, xvals, dy):
+    """returns the (len(Nvals), len(xvals)) matrix W such that W @ xf is
+    <x^(N-1)> = int dy x^(N-1) xf(x), with the quadrature of mom.py
+    """
+    Nvals = np.asarray(Nvals)
+    return dy * xvals[np.newaxis,:]**(Nvals[:,np.newaxis] - 1)
+
+
+def tabulate(pdfs, flavList, Qvals, xvals, myEval=None):
+    """returns an array of shape (flavour, Q, member, x) with x*f(x,Q)"""
+    nflav = len(myEval) if myEval else len(flavList)
+    tab = np.empty((nflav, len(Qvals), len(pdfs), len(xvals)))
+    for ipdf, pdf in enumerate(pdfs):
+        for iQ, Q in enumerate(Qvals):
+            tab[:,iQ,ipdf,:] = xf_flavours(pdf, flavList, xvals, Q, myEval)
+    return tab
+
+
+def moments(pdfs, Nvals, flavList, Qvals, xmin = None, myEval = None, dy_min = 0.1, ny_min = 100):
+    """returns the array of shape (N, flavour, Q, member) of the moments
+    <x^(N-1)> for each of the pdfs (e.g. pdfset.mkPDFs()). If myEval is
+    given, it is a list of strings in flv(iflav), as in pdf.py, and is
+    used instead of flavList.
+    """
+    if (xmin is None): xmin = pdfs[0].xMin
+    xvals, dy = mom.mom_grid(-log(xmin), dy_min, ny_min)
+    tab = tabulate(pdfs, flavList, Qvals, xvals, myEval)
+    weights = mellin_weights(Nvals, xvals, dy)
+    return np.tensordot(weights, tab, axes=([1],[3]))
+
+
+#----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='Print Mellin moments <x^(N-1)> of PDFs as a function of Q')
+    parser.add_argument('-pdf', type=str, default=default_pdf, help='PDF name')
+    parser.add_argument('-imem', type=int, default=0, help='The member to examine')
+    parser.add_argument('-err', action='store_true', help='Output the symm err')
+    parser.add_argument('-fullerr', action='store_true', help='Output the full error info')
+    parser.add_argument('-medianerr', action='store_true', help='use a median + interval uncertainty')
+
+    parser.add_argument('-N', type=str, default='2', help='Comma-separated list of (possibly complex) N values, e.g. 1,2,1.5+2j')
+    parser.add_argument('-contour', type=str, default="", help='C,PHI,TMAX,NT: take N along C + t*exp(i*PHI), 0<=t<=TMAX (overrides -N)')
+    parser.add_argument('-flav', '-flv', type=str, default='21',
+                         help='Comma-separated list of PDG IDs of flavours (if the first one is negative do e.g. -flav=-1,1)')
+    parser.add_argument('-eval', type=str, default="", help='Comma-separated evaluation strings, e.g. flv(2)-flv(-2) for the u valence')
+
+    parser.add_argument('-Q-lo', type=float, default=10.0, help='Lowest Q')
+    parser.add_argument('-Q-hi', type=float, default=10000.0, help='Highest Q')
+    parser.add_argument('-nQ', type=int, default=50, help='Number of Q values')
+    parser.add_argument('-xmin', type=float, default=None, help='Lower limit of the x integration (default is the PDF xMin)')
+    parser.add_argument('-dy-min', type=float, default=0.1, help='Maximum spacing in ln(1/x) of the integration grid')
+
+    parser.add_argument('-out', '-o', type=str, dest="out", default="", help='Output file (default is stdout)')
+    parser.add_argument('-prec', type=int, default=5, help='Number of digits of precision in printout (default 5)')
+
+    args = parser.parse_args()
+    err = args.err or args.fullerr
+
+    if (args.contour != ""):
+        c, phi, tmax, nt = args.contour.split(',')
+        Nvals = mellin_contour(float(c), float(phi), float(tmax), int(nt))
+    else:
+        Nvals = np.array([complex(N) for N in args.N.split(',')])
+    is_complex = np.any(Nvals.imag != 0)
+    if (not is_complex): Nvals = Nvals.real
+
+    if (args.eval != ""):
+        myEval = args.eval.split(',')
+        flavList = myEval
+    else:
+        myEval = None
+        flavList = [int(flav) for flav in args.flav.split(',')]
+
+    if (args.out != ""):
+        out = open(args.out,'w')
+    else:
+        out = sys.stdout
+    format="{{:<{}.{}g}}".format(args.prec+7,args.prec)
+
+    pdfset = lhapdf.getPDFSet(args.pdf)
+    if err: pdfs = pdfset.mkPDFs()
+    else  : pdfs = [pdfset.mkPDF(args.imem)]
+
+    Q_lo = max(args.Q_lo, sqrt(pdfs[0].q2Min))
+    Qvals = Q_lo*(args.Q_hi/Q_lo)**((1.0*np.arange(0,args.nQ))/(max(1,args.nQ-1)))
+
+    # the central work: shape (N, flavour, Q, member)
+    res = moments(pdfs, Nvals, flavList, Qvals, args.xmin, myEval, args.dy_min)
+
+    print("#", " ".join(sys.argv), file=out)
+    if err: print(f"# pdf = {args.pdf}, version = {pdfset.dataversion}", file=out)
+    else  : print(f"# pdf = {args.pdf}, imem = {args.imem}, version = {pdfset.dataversion}", file=out)
+
+    # the real and (if relevant) imaginary parts are treated as separate quantities
+    parts = [("re", res.real), ("im", res.imag)] if is_complex else [("", res.real)]
+    header = "# Columns: Q"
+    columns = []
+    for iflav,flav in enumerate(flavList):
+        for part, values in parts:
+            label = f"{part}mom({flav})"
+            if err:
+                uncert = bulkUncert(pdfset, values[:,iflav,:,:], args.medianerr)
+                header += f" {label} errsymm"
+                columns += [uncert.central, uncert.errsymm]
+                if (args.fullerr):
+                    header += " bandlo bandhi"
+                    columns += [uncert.central-np.abs(uncert.errminus), uncert.central+uncert.errplus]
+            else:
+                header += f" {label}"
+                columns += [values[:,iflav,:,0]]
+    # columns are each of shape (N, Q)
+    columns = np.array(columns)
+
+    for iN,N in enumerate(Nvals):
+        print(f"# N = {N}", file=out)
+        print(header, file=out)
+        print(reformat(Qvals, columns[:,iN,:].T, format=format), file=out)
+
+
+if __name__ == '__main__': main()
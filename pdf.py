@@ -6,6 +6,7 @@ from builtins import object
 import argparse
 import sys
 from pdf_base import *
+import reweight
 
 usage="""
   Usage:    ./pdf.py [-h] [options]
@@ -13,21 +14,33 @@ usage="""
   Options
   -------
 
-  -pdf  PDFname
+  -pdf  PDFname       (or PDF1,PDF2,... to compare sets, with ratios to PDF1)
   -Q    Q     
   -xmin xmin    
   -xmax xmax    
   -nx   nx
   -x-from-file FILENAME
+  -nodes              use the x nodes of the LHAPDF grid at the node Q closest
+                      to -Q, with values taken directly from the grid files
+  -points FILENAME    (x Q flav) columns, text or .npy; streamed in chunks
+  -chunk  N           number of points per chunk with -points (default 10000)
 
   -flav flav1,flav2   (use PDG codes)
   -eval 'eval-string' (e.g. "flv(1)-flv(-1)" to get d-dbar)
 
   -a-stretch A        (default 5.0, indicates stretching of large-x region)
+  -adaptive TOL       place the x points adaptively, so that linear interpolation
+                      in zeta reproduces the curves to TOL times their maximum
+                      (not guaranteed if -max-nx is reached; a warning is printed)
+  -adaptive-err       with -err, also resolve the edges of the error band
 
   -imem IMEM          just the given member
   -err                output the symm err
   -fullerr            output the full error info
+  -weights FILE       with -err, reweight the replicas (cf. reweight.py)
+  -compact            store the members as float32 differences from member 0
+  -cov  FILE          with -err, write the covariance (.npy: binary; else text)
+  -corr FILE          with -err, write the correlation matrix
 
   -out OUTPUT_FILE
 
@@ -52,11 +65,16 @@ def main():
     global a_stretch
 
     parser = argparse.ArgumentParser(description='Print out some aspect of a PDF')
-    parser.add_argument('-pdf', type=str, default=default_pdf, help='PDF name')
+    parser.add_argument('-pdf', type=str, default=default_pdf, help='PDF name, or comma-separated names to compare several sets (with ratios to the first)')
+    parser.add_argument('-nproc', type=int, default=1, help='Number of processes for evaluating several sets concurrently')
     parser.add_argument('-imem', type=int, default=0, help='The member to examine')
     parser.add_argument('-err', action='store_true', help='Output the symm err')
     parser.add_argument('-fullerr', action='store_true', help='Output the full error info')
-    parser.add_argument('-medianerr', action='store_true', help='use a median + interval uncertainty')
+    parser.add_argument('-medianerr', action='store_true', help='use a median + interval uncertainty (when comparing sets, only for replica sets)')
+    parser.add_argument('-weights', type=str, default="", help='with -err, reweight the replicas with the weights in this file (cf. reweight.py)')
+    parser.add_argument('-compact', action='store_true', help='with -err, store members as float32 differences from member 0 (halves memory)')
+    parser.add_argument('-cov', type=str, default="", help='with -err, write the covariance matrix over all (x, flavour) points to this file (.npy for binary, otherwise text)')
+    parser.add_argument('-corr', type=str, default="", help='with -err, write the correlation matrix over all (x, flavour) points to this file (.npy for binary, otherwise text)')
 
     parser.add_argument('-Q','-muF', type=float, default=100.0, help='Q')    
     parser.add_argument('-lnQ','-lnmuF', type=float, default=None, help='lnQ (overrides -Q)')
@@ -67,7 +85,16 @@ def main():
     parser.add_argument('-xmax', type=float, default=1.0, help='xmax')
     parser.add_argument('-nx', type=int, default=100, help='number of x values to print out (of Q values if used with -Qmin and -Qmax)')
     parser.add_argument('-x-from-file', type=str, default="", help='Read x values from file')
+    parser.add_argument('-nodes', action='store_true',
+                        help='Output the values at the grid nodes (between xmin and xmax) for the node Q closest to -Q, read directly from the grid files')
+    parser.add_argument('-points', type=str, default="",
+                        help='Read (x, Q, flavour) points from the first 3 columns of a text or .npy file, and output the PDF at each of them')
+    parser.add_argument('-chunk', type=int, default=10000, help='Number of points per chunk with -points (default 10000)')
     parser.add_argument('-a-stretch', type=float, default=a_stretch, help='Stretching of large-x region')
+    parser.add_argument('-adaptive', type=float, default=0.0,
+                        help='If non-zero, place x points adaptively so that linear interpolation in zeta reproduces each curve to this tolerance (relative to its maximum); if -max-nx is reached first, the tolerance may not be met (a warning is printed)')
+    parser.add_argument('-adaptive-err', action='store_true', help='With -adaptive and -err, also resolve the edges of the error band')
+    parser.add_argument('-max-nx', type=int, default=2000, help='Maximum number of points evaluated with -adaptive')
 
     parser.add_argument('-flav', '-flv', type=str, default='1', 
                          help='Comma-separated list of PDG IDs of flavours to print (if the first one is negative do e.g. -flav=-1,1)')
@@ -79,7 +106,8 @@ def main():
 
     # transfer arguments to local variables
     args = parser.parse_args()
-    pdfname = args.pdf
+    pdfnames = args.pdf.split(',')
+    pdfname = pdfnames[0]
     Q = args.Q
     if args.lnQ is not None: Q = exp(args.lnQ)
 
@@ -124,6 +152,7 @@ def main():
     if (x_from_file != ""):
         xs = get_x_from_file(x_from_file)
         nx = len(xs)
+        Qs = np.full(nx, Q)
     else:
         xs=np.empty([nx])
         Qs = np.logspace(log10(args.Qmin), log10(args.Qmax), nx)
@@ -132,12 +161,65 @@ def main():
         zetamax=zeta_of_x(xmax)
         for ix in range(0,nx): xs[ix] = x_of_zeta(zetamin + (zetamax-zetamin)*((1.0*ix)/max(1,nx-1)))
     
+    if (len(pdfnames) > 1):
+        # options that only apply to a single set
+        for option, used in (("-weights", args.weights != ""), ("-compact", args.compact),
+                             ("-cov", args.cov != ""), ("-corr", args.corr != ""),
+                             ("-points", args.points != ""), ("-nodes", args.nodes),
+                             ("-adaptive", args.adaptive > 0)):
+            if (used): raise ValueError(option+" cannot be used when comparing several sets")
+        compare_sets(pdfnames, flavList, myEval, xs, Qs, args, out, format)
+        if (print_info): printInfo(pdfname)
+        return
 
     if args.err:
         pdfs = pdfset.mkPDFs()
         pdf = pdfs[0]
+        weights = reweight.read_weights(args.weights, pdfset) if args.weights != "" else None
     else:
         pdf = pdfset.mkPDF(imem)
+        weights = None
+
+    # with -nodes, take the values at the grid nodes directly from the
+    # grid files, without interpolation
+    if (args.nodes):
+        import read_lhapdf
+        members = list(range(pdfset.size)) if args.err else [imem]
+        lhapdf_pdfs = pdfs if args.err else [pdf]
+        try:
+            node_pdfs = [read_lhapdf.NodePDF(read_lhapdf.read_member(pdfname, m), p)
+                         for m, p in zip(members, lhapdf_pdfs)]
+        except OSError as error:
+            print("# warning: could not read the grid files of {} ({}), using LHAPDF's interpolation at -Q".format(
+                pdfname, error), file=sys.stderr)
+            node_pdfs = None
+        if (node_pdfs is not None):
+            # use the node Q closest to the requested one
+            node_Qs = node_pdfs[0].node_Qs()
+            Q = node_Qs[np.argmin(np.abs(np.log(node_Qs/Q)))]
+            xs = node_pdfs[0].node_xs(Q, xmin, xmax)
+            nx = len(xs)
+            Qs = np.full(nx, Q)
+            if (args.err): pdfs = node_pdfs
+            pdf = node_pdfs[0]
+
+    if (args.adaptive > 0):
+        if (args.Qmin != args.Qmax or x_from_file != "" or args.nodes):
+            raise ValueError("-adaptive can only be used at fixed Q and without -x-from-file or -nodes")
+        adaptive_pdfs = pdfs if (args.err and args.adaptive_err) else [pdf]
+        def evaluate(xs_trial):
+            # values has shape (flavour, x, member)
+            values = np.moveaxis(np.array([xf_flavours(p, flavList, xs_trial, Q, myEval) for p in adaptive_pdfs]), 0, -1)
+            if (len(adaptive_pdfs) == 1): return values[:,:,0].T
+            uncert = bulkUncert(pdfset, values, args.medianerr, weights)
+            return np.concatenate((uncert.central-np.abs(uncert.errminus), uncert.central, uncert.central+uncert.errplus)).T
+        xs = adaptive_xs(evaluate, zeta_of_x(xmin), zeta_of_x(xmax), args.adaptive, max_points = args.max_nx)
+        nx = len(xs)
+        Qs = np.full(nx, Q)
+
+    if (args.points != ""):
+        point_cloud(args.points, args.chunk, pdfset, pdfs if args.err else [pdf], args, out, format, weights)
+        return
 
     #-- print the header
     if args.Qmin == args.Qmax:
@@ -160,7 +242,7 @@ def main():
     flv = lambda iflav: pdf.xfxQ(int(iflav), xs[ix], Qs[ix])
     if (args.err):
     
-        resfull=np.empty([nx,len(flavList),pdfset.size])
+        resfull=member_array([nx,len(flavList)], pdfset.size, args.compact)
         if (args.fullerr):
             ncol=4
         else:
@@ -168,16 +250,21 @@ def main():
         reserr=np.empty([nx,ncol*len(flavList)])
     
         for ix,x in enumerate(xs):
+            Q = Qs[ix]
             for iflav,flav in enumerate(flavList):
                 for ipdf,pdf in enumerate(pdfs):
                     if (myEval): resfull[ix,iflav,ipdf] = eval(myEval[iflav])
                     else:        resfull[ix,iflav,ipdf] = pdf.xfxQ(int(flav), xs[ix], Qs[ix])
-                if (args.medianerr):
-                    uncert = intervalUncert(resfull[ix,iflav,:])
+                values = resfull[ix,iflav,:]
+                if (weights is not None):
+                    uncert = bulkUncert(pdfset, values, args.medianerr, weights)
+                    reserr[ix,iflav*ncol  ] = uncert.central
+                elif (args.medianerr):
+                    uncert = intervalUncert(values)
                     reserr[ix,iflav*ncol  ] = uncert.central
                 else:
-                    uncert = pdfset.uncertainty(resfull[ix,iflav,:])
-                    reserr[ix,iflav*ncol  ] = resfull[ix,iflav,0]
+                    uncert = pdfset.uncertainty(values)
+                    reserr[ix,iflav*ncol  ] = values[0]
     
                 reserr[ix,iflav*ncol+1] = uncert.errsymm
                 if (args.fullerr):
@@ -188,6 +275,11 @@ def main():
             print(reformat(xs, reserr, format=format), file=out)
         else:
             print(reformat(xs, Qs, reserr, format=format), file=out)   
+
+        if (args.cov or args.corr):
+            # rows ordered with the flavour varying fastest
+            labels = ["x={:.6g},Q={:.6g},flav={}".format(xs[ix],Qs[ix],flav) for ix in range(nx) for flav in flavList]
+            write_cov_corr(pdfset, resfull.reshape(nx*len(flavList), pdfset.size), labels, args.cov, args.corr, weights)
     else:
         res=np.empty([nx,len(flavList)])
         print("", file=out)
@@ -206,6 +298,53 @@ def main():
 
     if (print_info): printInfo(pdfname)
 
+#----------------------------------------------------------------------
+def evaluate_set(pdfname, flavList, myEval, xs, Qs, err, medianerr, imem):
+    '''returns a tuple (central, errsymm, errminus, errplus) of arrays of
+    shape (len(xs), len(flavList)) for the set pdfname; the uncertainty
+    follows the set's own convention, with medianerr applied only to
+    replica sets. Without err, the errors are None.
+    '''
+    pdfset = lhapdf.getPDFSet(pdfname)
+    pdfs = pdfset.mkPDFs() if err else [pdfset.mkPDF(imem)]
+    values = np.empty((len(xs), len(flavList), len(pdfs)))
+    for ipdf,pdf in enumerate(pdfs):
+        values[:,:,ipdf] = xf_flavours(pdf, flavList, xs, Qs, myEval).T
+    if (not err): return values[:,:,0], None, None, None
+
+    medianerr = medianerr and pdfset.errorType == "replicas"
+    uncert = bulkUncert(pdfset, values, medianerr)
+    central = uncert.central if medianerr else values[:,:,0]
+    return central, uncert.errsymm, uncert.errminus, uncert.errplus
+
+def compare_sets(pdfnames, flavList, myEval, xs, Qs, args, out, format):
+    '''prints the results for each of the sets side by side, with ratios
+    to the first set; the sets are evaluated on the same points, in
+    parallel if args.nproc > 1
+    '''
+    jobs = [(pdfname, flavList, myEval, xs, Qs, args.err, args.medianerr, args.imem) for pdfname in pdfnames]
+    if (args.nproc > 1):
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=args.nproc) as executor:
+            results = list(executor.map(evaluate_set, *zip(*jobs)))
+    else:
+        results = [evaluate_set(*job) for job in jobs]
+
+    versions = ",".join([str(lhapdf.getPDFSet(pdfname).dataversion) for pdfname in pdfnames])
+    if args.Qmin == args.Qmax:
+        print("# pdfs = {}, Q = {}, versions = {}".format(",".join(pdfnames), Qs[0], versions), file=out)
+        header = "# Columns: x"
+    else:
+        print("# pdfs = {}, Qmin = {}, Qmax = {}, versions = {}".format(",".join(pdfnames), args.Qmin, args.Qmax, versions), file=out)
+        header = "# Columns: x Q"
+    labels = ["x*flav({})".format(flav) for flav in flavList]
+    columns_header, columns = comparison_columns(pdfnames, results, labels, args.err, args.fullerr)
+    print(header + columns_header, file=out)
+    if args.Qmin == args.Qmax:
+        print(reformat(xs, np.array(columns).T, format=format), file=out)
+    else:
+        print(reformat(xs, Qs, np.array(columns).T, format=format), file=out)
+
 #----------------------------------------------------------------------    
 def get_x_from_file(filename):
     '''Ignores lines that start with a hash; and assumes that x values 
@@ -215,33 +354,188 @@ def get_x_from_file(filename):
     with open(filename,'r') as f:
         for line in f:
             line = line.strip()
-            if (line[0] == '#' or len(line) == 0): continue
-            values = line.split(' ')
+            if (len(line) == 0 or line[0] == '#'): continue
+            values = line.split()
             xlist.append(float(values[0]))
     return np.array(xlist)
 
-def zeta_of_x(x):
-    y = log(1.0/x)
-    return  y + a_stretch*(1.0 - x)
+#----------------------------------------------------------------------
+def read_points(filename, chunk):
+    '''Yields arrays of shape (n <= chunk, 3) with the (x, Q, flavour)
+    columns of filename, which is either a .npy file (memory mapped) or
+    a text file in which blank lines and lines starting with a hash are
+    ignored
+    '''
+    if (filename.endswith('.npy')):
+        points = np.load(filename, mmap_mode='r')
+        for start in range(0, len(points), chunk):
+            yield np.array(points[start:start+chunk, :3], dtype=float)
+    else:
+        buffer = []
+        with open(filename,'r') as f:
+            for line in f:
+                line = line.strip()
+                if (len(line) == 0 or line[0] == '#'): continue
+                buffer.append([float(value) for value in line.split()[:3]])
+                if (len(buffer) == chunk):
+                    yield np.array(buffer)
+                    buffer = []
+        if (buffer): yield np.array(buffer)
+
+def evaluate_points(pdfs, points):
+    '''returns an array of shape (len(points), len(pdfs)) with x*f(x,Q)
+    at each of the (x, Q, flavour) points, for each of the pdfs
+    '''
+    xs, Qs, flavs = points[:,0], points[:,1], points[:,2].astype(int)
+    res = np.empty((len(points), len(pdfs)))
+    for ipdf, pdf in enumerate(pdfs):
+        for flav in np.unique(flavs):
+            sel = (flavs == flav)
+            res[sel,ipdf] = xfxQ_array(pdf, flav, xs[sel], Qs[sel])
+    return res
+
+def point_cloud(filename, chunk, pdfset, pdfs, args, out, format, weights = None):
+    '''Streams the (x, Q, flavour) points from filename through the pdfs,
+    one chunk at a time, so that memory use does not grow with the number
+    of points; weights, if given, are those of reweight.py
+    '''
+    if (args.err):
+        print("# pdf = {}, version = {}".format(args.pdf, pdfset.dataversion), file=out)
+        header = "# Columns: x Q flav x*flav errsymm"
+        if (args.fullerr): header += " bandlo bandhi"
+    else:
+        print("# pdf = {}, imem = {}, version = {}".format(args.pdf, args.imem, pdfset.dataversion), file=out)
+        header = "# Columns: x Q flav x*flav"
+    print(header, file=out)
 
-def x_of_zeta(zeta):
+    for points in read_points(filename, chunk):
+        res = evaluate_points(pdfs, points)
+        if (args.err):
+            uncert = bulkUncert(pdfset, res, args.medianerr, weights)
+            central = uncert.central if (args.medianerr or weights is not None) else res[:,0]
+            columns = [central, uncert.errsymm]
+            if (args.fullerr):
+                columns += [uncert.central-np.abs(uncert.errminus), uncert.central+uncert.errplus]
+        else:
+            columns = [res[:,0]]
+        print(reformat(points[:,0], points[:,1], points[:,2], np.array(columns).T, format=format), end='', file=out)
+
+#----------------------------------------------------------------------
+def adaptive_xs(evaluate, zetamin, zetamax, tol, n_initial = 9, max_points = 2000):
+    '''Returns an array of x values, in increasing order, such that linear
+    interpolation in zeta between them reproduces the curves to within
+    tol times the maximum absolute value of each curve.
+
+    evaluate(xs) should return an array of shape (len(xs), ncurves). The
+    intervals of an initially uniform zeta grid are bisected wherever
+    the mid-point deviates from the linear interpolation by more than
+    the tolerance (until at most max_points have been evaluated, in
+    which case the tolerance may not be met and a warning is printed
+    to stderr), and the samples are then thinned (Douglas-Peucker) to the smallest set
+    that still reproduces all of them to the tolerance. As the thinned
+    intervals have only been checked at the samples they dropped, the
+    mid-point of each is then checked too, and added wherever it misses
+    the tolerance, until all the mid-points pass (again within
+    max_points evaluations).
+    '''
+    zetas = list(np.linspace(zetamin, zetamax, n_initial))
+    values = list(evaluate(np.array([x_of_zeta(zeta) for zeta in zetas])))
+    todo = [(zetas[i], values[i], zetas[i+1], values[i+1]) for i in range(n_initial-1)]
+    scale = np.max(np.abs(values), axis=0)
+
+    while (len(todo) > 0 and len(zetas) + len(todo) <= max_points):
+        mid_zetas = np.array([0.5*(za+zb) for za, va, zb, vb in todo])
+        mid_values = evaluate(np.array([x_of_zeta(zeta) for zeta in mid_zetas]))
+        linear = np.array([0.5*(va+vb) for za, va, zb, vb in todo])
+        scale = np.maximum(scale, np.max(np.abs(mid_values), axis=0))
+        bad = np.any(np.abs(mid_values - linear) > tol*scale, axis=1)
+
+        zetas  += list(mid_zetas)
+        values += list(mid_values)
+        new_todo = []
+        for i, (za, va, zb, vb) in enumerate(todo):
+            if bad[i]:
+                new_todo.append((za, va, mid_zetas[i], mid_values[i]))
+                new_todo.append((mid_zetas[i], mid_values[i], zb, vb))
+        todo = new_todo
+
+    if (len(todo) > 0):
+        print("WARNING: adaptive_xs stopped at {} points (max_points = {}) with {} intervals "
+              "still above the tolerance {}; the curves are under-resolved".format(
+                  len(zetas), max_points, len(todo), tol), file=sys.stderr)
+
+    # order the samples in increasing x, i.e. decreasing zeta
+    order = np.argsort(zetas)[::-1]
+    zetas  = np.array(zetas)[order]
+    values = np.array(values)[order]
+
+    # Douglas-Peucker thinning
+    keep = np.zeros(len(zetas), dtype=bool)
+    keep[0] = keep[-1] = True
+    segments = [(0, len(zetas)-1)]
+    while (len(segments) > 0):
+        i, j = segments.pop()
+        if (j - i < 2): continue
+        frac = ((zetas[i+1:j] - zetas[i]) / (zetas[j] - zetas[i]))[:,np.newaxis]
+        linear = values[i] + frac * (values[j] - values[i])
+        deviation = np.max(np.abs(values[i+1:j] - linear) / (tol*scale + 1e-300), axis=1)
+        k = i + 1 + np.argmax(deviation)
+        if (deviation[k-i-1] > 1.0):
+            keep[k] = True
+            segments += [(i, k), (k, j)]
+
+    # check the mid-points of the kept intervals
+    nevaluated = len(zetas)
+    zetas  = zetas[keep]
+    values = values[keep]
+    checked = np.zeros(len(zetas)-1, dtype=bool)
+    while (not checked.all()):
+        idx = np.nonzero(~checked)[0]
+        if (nevaluated + len(idx) > max_points):
+            print("WARNING: adaptive_xs reached max_points = {} with {} thinned intervals "
+                  "still to be checked against the tolerance {}".format(max_points, len(idx), tol), file=sys.stderr)
+            break
+        mid_zetas = 0.5*(zetas[idx] + zetas[idx+1])
+        mid_values = evaluate(np.array([x_of_zeta(zeta) for zeta in mid_zetas]))
+        nevaluated += len(idx)
+        scale = np.maximum(scale, np.max(np.abs(mid_values), axis=0))
+        bad = np.any(np.abs(mid_values - 0.5*(values[idx] + values[idx+1])) > tol*scale, axis=1)
+        checked[idx] = True
+        # each failing interval is split at its mid-point, and both
+        # halves are checked in the next round
+        checked[idx[bad]] = False
+        checked = np.insert(checked, idx[bad]+1, False)
+        zetas   = np.insert(zetas,   idx[bad]+1, mid_zetas[bad])
+        values  = np.insert(values,  idx[bad]+1, mid_values[bad], axis=0)
+
+    return np.array([x_of_zeta(zeta) for zeta in zetas])
+
+def zeta_of_x(x, a = None):
+    """zeta = ln(1/x) + a*(1-x), with a = a_stretch by default; x can be
+    a number or a numpy array
+    """
+    if (a is None): a = a_stretch
+    y = np.log(1.0/x)
+    return  y + a*(1.0 - x)
+
+def x_of_zeta(zeta, a = None):
+    if (a is None): a = a_stretch
     y = zeta
     eps = 1e-12
     maxiter = 100
-    if (a_stretch != 0):
+    if (a != 0):
         for iter in range(0, maxiter+1):
             if (iter == maxiter):
                 print("Could not solve x from zeta", file=sys.stderr)
                 sys.exit(-1)
             x = exp(-y)
-            diff_from_zero = zeta - y - a_stretch*(1.0-x)
+            diff_from_zero = zeta - y - a*(1.0-x)
             # we have found good solution
             if (abs(diff_from_zero) < eps): break
-            deriv = -1.0  - a_stretch*x;
+            deriv = -1.0  - a*x;
             y = y - diff_from_zero/deriv
           
     return exp(-y)
 
-
 if __name__ == '__main__':
     main()
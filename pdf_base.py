@@ -1,14 +1,26 @@
 import subprocess
 import sys
 # figure out where lhapdf's python package is hiding
-lhapdfPath = str(subprocess.Popen(["lhapdf-config", "--prefix"],
-                            stdout=subprocess.PIPE).communicate()[0].rstrip())
-lhapdfPath += "/lib/python{}.{}/site-packages".format(sys.version_info[0],sys.version_info[1])
-# include it in the python path
-sys.path = [lhapdfPath] + sys.path
-#sys.path.append(lhapdfPath)
+try:
+    lhapdfPath = str(subprocess.Popen(["lhapdf-config", "--prefix"],
+                                stdout=subprocess.PIPE).communicate()[0].rstrip())
+    lhapdfPath += "/lib/python{}.{}/site-packages".format(sys.version_info[0],sys.version_info[1])
+    # include it in the python path
+    sys.path = [lhapdfPath] + sys.path
+    #sys.path.append(lhapdfPath)
+except OSError:
+    pass
 import io
-import lhapdf
+import math
+import numpy as np
+from statistics import NormalDist
+from math import sqrt
+try:
+    import lhapdf
+except ImportError:
+    # the numerical helpers below (and their tests) do not need lhapdf;
+    # the scripts do
+    lhapdf = None
 
 default_pdf = "MSHT20nnlo_as118"
 default_rts = 13600.0
@@ -120,3 +132,413 @@ class intervalUncert(object):
         self.errminus = self.central - percentile(percentile_lo, sorted_values)
         self.errsymm  = 0.5 * (self.errplus + abs(self.errminus))
 
+
+def weighted_percentiles(percs, values, weights):
+    """returns an array of shape (len(percs),) + values.shape[:-1] with the
+    weighted percentiles (fractions between 0 and 1) of values along their
+    last axis. The sorted values are placed at the mid-points of their
+    cumulative weight, rescaled so that the first and last ones sit at 0
+    and 1; with equal weights this reduces to the percentile function
+    above.
+    """
+    values = np.asarray(values, dtype=float)
+    weights = np.broadcast_to(np.asarray(weights, dtype=float), values.shape)
+    order = np.argsort(values, axis=-1)
+    sorted_values  = np.take_along_axis(values,  order, axis=-1)
+    sorted_weights = np.take_along_axis(weights, order, axis=-1)
+    cumul = np.cumsum(sorted_weights, axis=-1) - 0.5*sorted_weights
+    lo = cumul[...,0:1]
+    hi = cumul[...,-1:]
+    positions = (cumul - lo) / (hi - lo)
+
+    n = values.shape[-1]
+    res = np.empty((len(percs),) + values.shape[:-1])
+    for iperc, perc in enumerate(percs):
+        i = np.clip(np.count_nonzero(positions <= perc, axis=-1) - 1, 0, n-2)[...,np.newaxis]
+        p1 = np.take_along_axis(positions, i, axis=-1)
+        p2 = np.take_along_axis(positions, i+1, axis=-1)
+        v1 = np.take_along_axis(sorted_values, i, axis=-1)
+        v2 = np.take_along_axis(sorted_values, i+1, axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            w2 = np.where(p2 > p1, (perc - p1)/(p2 - p1), 0.0)
+        res[iperc] = (v1 + (v2 - v1) * w2)[...,0]
+    return res
+
+
+class weightedUncert(object):
+    """\
+    Uncertainties of a reweighted replica set, with the members along the
+    last axis of values (member 0 is ignored) and one weight for each
+    replica: a weighted mean and standard deviation, or, if medianerr is
+    True, the weighted counterpart of intervalUncert. With equal weights,
+    the results are those of bulkUncert for a replica set.
+    """
+    def __init__(self, values, weights, medianerr = False):
+        values = np.asarray(values, dtype=float)[...,1:]
+        weights = np.asarray(weights, dtype=float)
+        if (weights.shape[-1] != values.shape[-1]):
+            raise ValueError("got {} weights for {} replicas".format(weights.shape[-1], values.shape[-1]))
+        if (medianerr):
+            onesigma = 0.682689492137
+            percentile_lo = (1 - onesigma)/2.0
+            lo, mid, hi = weighted_percentiles([percentile_lo, 0.5, 1-percentile_lo], values, weights)
+            self.central  = mid
+            self.errplus  = hi - mid
+            self.errminus = mid - lo
+        else:
+            # mean and variance with the unbiased normalisation for
+            # reliability weights, i.e. ddof=1 for equal weights
+            V1 = weights.sum()
+            V2 = (weights**2).sum()
+            self.central = (values * weights).sum(axis=-1) / V1
+            variance = (weights * (values - self.central[...,np.newaxis])**2).sum(axis=-1) / (V1 - V2/V1)
+            self.errplus  = np.sqrt(variance)
+            self.errminus = self.errplus
+        self.errsymm  = 0.5 * (self.errplus + np.abs(self.errminus))
+
+
+
+#----------------------------------------------------------------------
+def xfxQ_array(pdf, iflav, xs, Qs):
+    """returns a numpy array with x*f(x,Q) for flavour iflav at each of
+    the xs; Qs can be either a single value or an array with the same
+    shape as xs. Objects other than LHAPDF PDFs (e.g. the surrogates of
+    surrogate.py) can provide their own vectorised xfxQ_array method.
+    """
+    if hasattr(pdf, "xfxQ_array"): return pdf.xfxQ_array(iflav, xs, Qs)
+    xs = np.asarray(xs, dtype=float)
+    Qs = np.broadcast_to(np.asarray(Qs, dtype=float), xs.shape)
+    iflav = int(iflav)
+    return np.fromiter((pdf.xfxQ(iflav, x, Q) for x, Q in zip(xs.flat, Qs.flat)),
+                       dtype=float, count=xs.size).reshape(xs.shape)
+
+
+def eval_namespace():
+    """returns the names available in -eval strings besides flv, x and Q:
+    those of the math module, replaced by their numpy versions where
+    these exist so that they act on arrays, and np itself
+    """
+    namespace = {}
+    for name in dir(math):
+        if name.startswith("_"): continue
+        namespace[name] = getattr(np, name, getattr(math, name))
+    namespace["np"] = np
+    namespace["abs"] = np.abs
+    return namespace
+
+
+def xf_flavours(pdf, flavList, xs, Qs, myEval=None):
+    """returns an array of shape (len(flavList), len(xs)) with x*f(x,Q)
+    for each of the flavours. If myEval is supplied, it should be a list
+    of strings such as "flv(1)-flv(-1)" or "flv(21)/x", which are
+    evaluated with flv, x and Q as arrays (and with the names from the
+    math module, in their numpy versions where these exist), and flavList
+    is then ignored.
+    """
+    flv = lambda iflav: xfxQ_array(pdf, iflav, xs, Qs)
+    if (myEval):
+        namespace = eval_namespace()
+        namespace.update({"flv" : flv, "x" : np.asarray(xs, dtype=float),
+                          "Q" : np.broadcast_to(np.asarray(Qs, dtype=float), np.shape(xs))})
+        return np.array([np.broadcast_to(eval(expr, namespace), np.shape(xs)) for expr in myEval])
+    else:
+        return np.array([flv(iflav) for iflav in flavList])
+
+
+#----------------------------------------------------------------------
+def cl_scale(pdfset, cl = 100*0.682689492137):
+    """returns the factor by which the set's Hessian uncertainties should
+    be multiplied so as to correspond to confidence level cl (in percent),
+    as done inside LHAPDF's PDFSet::uncertainty
+    """
+    set_cl = getattr(pdfset, "errorConfLevel", cl)
+    if (set_cl is None or set_cl <= 0 or abs(set_cl - cl) < 1e-6): return 1.0
+    return NormalDist().inv_cdf(0.5+cl/200.0) / NormalDist().inv_cdf(0.5+set_cl/200.0)
+
+
+class bulkUncert(object):
+    """\
+    A vectorised counterpart of pdfset.uncertainty (or of intervalUncert,
+    if medianerr is True). The values should have the members along their
+    last axis; central, errplus, errminus and errsymm are then arrays with
+    the remaining shape. Error types that are not handled here (e.g. with
+    extra alphas members) fall back to pdfset.uncertainty point by point.
+    If weights (one per replica, cf. reweight.py) are given, the set must
+    consist of replicas and the result is that of weightedUncert. The
+    values can also be a compactMembers, which is then processed a chunk
+    of rows at a time, without ever holding all of its members in double
+    precision.
+    """
+    def __init__(self, pdfset, values, medianerr = False, weights = None):
+        if (isinstance(values, compactMembers)):
+            shape = values.shape[:-1]
+            self.central, self.errplus, self.errminus, self.errsymm = [np.empty(shape) for i in range(4)]
+            for rows, chunk in values.row_chunks():
+                uncert = bulkUncert(pdfset, chunk, medianerr, weights)
+                self.central [rows] = uncert.central
+                self.errplus [rows] = uncert.errplus
+                self.errminus[rows] = uncert.errminus
+                self.errsymm [rows] = uncert.errsymm
+            return
+        values = np.asarray(values, dtype=float)
+        if (weights is not None):
+            if (pdfset.errorType != "replicas"):
+                raise ValueError("weights can only be used with replica sets, not "+pdfset.errorType)
+            uncert = weightedUncert(values, weights, medianerr)
+            self.central, self.errplus, self.errminus, self.errsymm = (
+                uncert.central, uncert.errplus, uncert.errminus, uncert.errsymm)
+            return
+        if (medianerr):
+            onesigma = 0.682689492137
+            percentile_lo = (1 - onesigma)/2.0
+            # np.percentile's default (linear) interpolation is the same
+            # as that of the percentile function above
+            lo, mid, hi = np.percentile(values[...,1:], [100*percentile_lo, 50.0, 100*(1-percentile_lo)], axis=-1)
+            self.central  = mid
+            self.errplus  = hi - mid
+            self.errminus = mid - lo
+            self.errsymm  = 0.5 * (self.errplus + np.abs(self.errminus))
+            return
+
+        errtype = pdfset.errorType
+        if (errtype == "replicas"):
+            nrep = values.shape[-1] - 1
+            self.central = values[...,1:].mean(axis=-1)
+            self.errsymm = values[...,1:].std(axis=-1, ddof=1) if nrep > 1 else np.zeros(values.shape[:-1])
+            self.errplus  = self.errsymm
+            self.errminus = self.errsymm
+        elif (errtype == "hessian"):
+            scale = cl_scale(pdfset)
+            central = values[...,0:1]
+            plus  = values[...,1::2] - central
+            minus = values[...,2::2] - central
+            zero = np.zeros(plus.shape)
+            self.central  = values[...,0]
+            self.errplus  = scale * np.sqrt((np.maximum(np.maximum(plus,  minus), zero)**2).sum(axis=-1))
+            self.errminus = scale * np.sqrt((np.maximum(np.maximum(-plus,-minus), zero)**2).sum(axis=-1))
+            self.errsymm  = scale * 0.5 * np.sqrt(((plus - minus)**2).sum(axis=-1))
+        elif (errtype == "symmhessian"):
+            scale = cl_scale(pdfset)
+            self.central  = values[...,0]
+            self.errsymm  = scale * np.sqrt(((values[...,1:] - values[...,0:1])**2).sum(axis=-1))
+            self.errplus  = self.errsymm
+            self.errminus = self.errsymm
+        else:
+            shape = values.shape[:-1]
+            self.central  = np.empty(shape)
+            self.errplus  = np.empty(shape)
+            self.errminus = np.empty(shape)
+            self.errsymm  = np.empty(shape)
+            for idx in np.ndindex(*shape):
+                uncert = pdfset.uncertainty(list(values[idx]))
+                self.central [idx] = uncert.central
+                self.errplus [idx] = uncert.errplus
+                self.errminus[idx] = uncert.errminus
+                self.errsymm [idx] = uncert.errsymm
+
+
+#----------------------------------------------------------------------
+def cubic_interp_uniform(table, y0, dy, y):
+    """returns the cubic (Catmull-Rom) interpolation along the last axis
+    of table, whose entries correspond to y0 + dy*i, at the points y;
+    the result has shape table.shape[:-1] + np.shape(y). Points outside
+    the tabulated range are extrapolated with the edge cubic.
+    """
+    table = np.asarray(table, dtype=float)
+    n = table.shape[-1]
+    t = (np.asarray(y, dtype=float) - y0) / dy
+    i = np.clip(np.floor(t).astype(int), 0, n-2)
+    t = t - i
+
+    deriv = np.empty(table.shape)
+    deriv[...,1:-1] = 0.5 * (table[...,2:] - table[...,:-2])
+    deriv[...,0]  = table[...,1]  - table[...,0]
+    deriv[...,-1] = table[...,-1] - table[...,-2]
+
+    t2 = t*t
+    t3 = t2*t
+    return (( 2*t3 - 3*t2 + 1) * table[...,i]
+          + (   t3 - 2*t2 + t) * deriv[...,i]
+          + (-2*t3 + 3*t2    ) * table[...,i+1]
+          + (   t3 -   t2    ) * deriv[...,i+1])
+
+
+#----------------------------------------------------------------------
+def member_array(shape, nmem, compact = False):
+    """returns storage for results with an extra (last) axis of nmem
+    members: a float64 numpy array or, if compact, a compactMembers
+    """
+    if (compact): return compactMembers(shape, nmem)
+    else        : return np.empty(list(shape) + [nmem])
+
+
+class compactMembers(object):
+    """\
+    Storage for per-member results in which member 0 is kept in double
+    precision and the others only as single-precision differences from
+    it, halving the memory of large replica sets. It is indexed like a
+    numpy array with the members along the last axis (member 0 must be
+    set first) and returns float64 values, so that uncertainties are
+    still accumulated in double precision; only the members requested
+    are converted. bulkUncert and covariance accept the object itself
+    (or a view of it from reshape) and work through it in chunks.
+
+    The rounding of a difference d to float32 introduces an error of at
+    most 6e-8*|d|, i.e. about 6e-8 of the PDF uncertainty itself and well
+    below the ~7 significant digits of the LHAPDF text grids.
+    """
+    def __init__(self, shape, nmem):
+        self.shape   = tuple(shape) + (nmem,)
+        self.central = np.zeros(shape)
+        self.deltas  = np.zeros(tuple(shape) + (nmem-1,), dtype=np.float32)
+
+    def __setitem__(self, key, value):
+        idx, imem = key[:-1], key[-1]
+        if (imem == slice(None)):
+            value = np.asarray(value, dtype=float)
+            self.central[idx] = value[...,0]
+            self.deltas[idx]  = value[...,1:] - value[...,0:1]
+        elif (imem == 0):
+            self.central[idx] = value
+        else:
+            self.deltas[idx + (imem-1,)] = value - self.central[idx]
+
+    def __getitem__(self, key):
+        idx, imem = key[:-1], key[-1]
+        central = np.asarray(self.central[idx])
+        if (not isinstance(imem, slice)):
+            imem = range(self.shape[-1])[imem]
+            return central.copy() if imem == 0 else central + self.deltas[idx + (imem-1,)]
+        # only the requested members are converted to float64
+        members = np.arange(self.shape[-1])[imem]
+        values = central[...,np.newaxis] + self.deltas[idx][...,np.maximum(members-1, 0)]
+        values[...,members == 0] = central[...,np.newaxis]
+        return values
+
+    def reshape(self, *shape):
+        """returns a compactMembers view of the same storage with the given
+        shape, whose last entry must be the number of members
+        """
+        if (len(shape) == 1): shape = shape[0]
+        shape = tuple(shape)
+        if (shape[-1] != self.shape[-1]): raise ValueError("the last axis must have the {} members".format(self.shape[-1]))
+        view = compactMembers.__new__(compactMembers)
+        view.shape   = shape
+        view.central = self.central.reshape(shape[:-1])
+        view.deltas  = self.deltas.reshape(shape[:-1] + (shape[-1]-1,))
+        return view
+
+    def row_chunks(self, size = 2**20):
+        """yields (rows, values) for successive slices rows of the first
+        axis, values being the float64 values of all members for those
+        rows, with about size entries at a time
+        """
+        nrows = max(1, size // int(np.prod(self.shape[1:])))
+        for start in range(0, self.shape[0], nrows):
+            rows = slice(start, min(start+nrows, self.shape[0]))
+            yield rows, self[rows, ..., :]
+
+
+#----------------------------------------------------------------------
+def comparison_columns(pdfnames, results, labels, err = False, fullerr = False):
+    """returns (header, columns) for printing the results for several
+    sets side by side, each followed by its ratio to the first set.
+    results[iset] is a tuple (central, errsymm, errminus, errplus) of
+    arrays of shape (npoints, len(labels)); without err, only central is
+    used. The ratio uncertainties are those of each set divided by the
+    central value of the reference set.
+    """
+    header = ""
+    columns = []
+    ref = results[0][0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for ilabel, label in enumerate(labels):
+            for pdfname, (central, errsymm, errminus, errplus) in zip(pdfnames, results):
+                header += " {}[{}]".format(label, pdfname)
+                columns.append(central[:,ilabel])
+                if (err):
+                    header += " errsymm"
+                    columns.append(errsymm[:,ilabel])
+                    if (fullerr):
+                        header += " bandlo bandhi"
+                        columns += [central[:,ilabel]-np.abs(errminus[:,ilabel]), central[:,ilabel]+errplus[:,ilabel]]
+                header += " ratio"
+                columns.append(central[:,ilabel]/ref[:,ilabel])
+                if (err):
+                    header += " ratio_errsymm"
+                    columns.append(errsymm[:,ilabel]/ref[:,ilabel])
+    return header, columns
+
+
+#----------------------------------------------------------------------
+def covariance(pdfset, values, weights = None, chunk = 100):
+    """returns the PDF-uncertainty covariance matrix, of shape (npoints,
+    npoints), for values of shape (npoints, members), with the Hessian or
+    replica conventions (and the same confidence-level scaling as
+    bulkUncert). It is accumulated as matrix products over chunks of
+    (about) chunk members, so that values can also be a compactMembers.
+    With weights (one per replica, cf. reweight.py), the replica
+    covariance is the weighted one, normalised as in weightedUncert, so
+    that its diagonal is the square of the weighted errsymm.
+    """
+    if (not isinstance(values, compactMembers)): values = np.asarray(values, dtype=float)
+    npoints, nmem = values.shape
+    errtype = pdfset.errorType
+    if (weights is not None and errtype != "replicas"):
+        raise ValueError("weights can only be used with replica sets, not "+errtype)
+    cov = np.zeros((npoints, npoints))
+    if (errtype == "replicas"):
+        # weights normalised to sum to the number of replicas
+        w = np.ones(nmem-1) if weights is None else np.asarray(weights, dtype=float) * (nmem-1) / np.sum(weights)
+        mean = np.zeros(npoints)
+        for start in range(1, nmem, chunk):
+            mean += values[:,start:start+chunk] @ w[start-1:start-1+chunk]
+        mean /= w.sum()
+        for start in range(1, nmem, chunk):
+            deltas = values[:,start:start+chunk] - mean[:,np.newaxis]
+            cov += (deltas * w[start-1:start-1+chunk]) @ deltas.T
+        cov /= w.sum() - (w**2).sum()/w.sum()
+    elif (errtype == "hessian"):
+        scale = cl_scale(pdfset)
+        for start in range(1, nmem, 2*chunk):
+            block = values[:,start:start+2*chunk]
+            deltas = 0.5 * scale * (block[:,0::2] - block[:,1::2])
+            cov += deltas @ deltas.T
+    elif (errtype == "symmhessian"):
+        scale = cl_scale(pdfset)
+        central = values[:,0]
+        for start in range(1, nmem, chunk):
+            deltas = scale * (values[:,start:start+chunk] - central[:,np.newaxis])
+            cov += deltas @ deltas.T
+    else:
+        raise ValueError("covariance not implemented for error type "+errtype)
+    return cov
+
+
+def correlation(covariance):
+    "returns the correlation matrix corresponding to a covariance matrix"
+    sigma = np.sqrt(np.diag(covariance))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return covariance / np.outer(sigma, sigma)
+
+
+def write_matrix(filename, matrix, labels):
+    """writes the matrix in binary .npy format if filename ends in .npy,
+    and otherwise as text, with the labels of the rows in the header
+    """
+    if (filename.endswith(".npy")):
+        np.save(filename, matrix)
+    else:
+        np.savetxt(filename, matrix, fmt="%.8g", header="rows/columns: "+" ".join(labels))
+
+
+def write_cov_corr(pdfset, values, labels, cov_file = "", corr_file = "", weights = None):
+    """computes the covariance of values, of shape (npoints, members)
+    (a numpy array or a compactMembers), with the replica weights if
+    given, and writes it and/or the corresponding correlation matrix to
+    the files (if their names are non-empty)
+    """
+    if (cov_file == "" and corr_file == ""): return
+    cov = covariance(pdfset, values, weights)
+    if (cov_file  != ""): write_matrix(cov_file, cov, labels)
+    if (corr_file != ""): write_matrix(corr_file, correlation(cov), labels)
@@ -5,6 +5,7 @@ Script to print out initial condition of an LHAPDF set. Usage:
     read_lhapdf.py -pdf <pdfset> [-flav <flavour>]
 """
 import argparse
+import os
 # for running processes
 import subprocess
 import yaml
@@ -15,7 +16,153 @@ from yaml import load
 
 
 # get the data directory as the output of lhapdf-config --datadir
-data_dir = str(subprocess.check_output(['lhapdf-config', '--datadir']),encoding="utf-8").strip()
+try:
+    data_dir = str(subprocess.check_output(['lhapdf-config', '--datadir']),encoding="utf-8").strip()
+except OSError:
+    data_dir = ""
+
+def set_dir(pdfset):
+    """returns the directory of pdfset, searched for in the same paths as
+    LHAPDF itself (LHAPDF_DATA_PATH etc.), then in data_dir
+    """
+    from pdf_base import lhapdf
+    paths = list(lhapdf.paths()) if lhapdf is not None else []
+    for path in paths + [data_dir]:
+        if os.path.isdir(os.path.join(path, pdfset)): return os.path.join(path, pdfset)
+    return os.path.join(data_dir, pdfset)
+
+def member_file(pdfset, imem):
+    "returns the name of the .dat file for member imem of pdfset"
+    return f'{set_dir(pdfset)}/{pdfset}_{imem:04d}.dat'
+
+def read_info(pdfset):
+    "returns a dictionary with the contents of the .info file of pdfset"
+    with open(f'{set_dir(pdfset)}/{pdfset}.info', 'r') as stream:
+        return yaml.safe_load(stream)
+
+def read_member_header(pdfset, imem):
+    "returns a dictionary with the YAML header (before the first ---) of member imem"
+    lines = []
+    with open(member_file(pdfset, imem), 'r') as stream:
+        for line in stream:
+            if line.startswith("---"): break
+            lines.append(line)
+    return yaml.safe_load("".join(lines)) or {}
+
+#----------------------------------------------------------------------
+class Subgrid(object):
+    """\
+    One block of an LHAPDF (lhagrid1) member file: x_values, muF_values,
+    flavs and tabulation[ix, iflav, imu] = x*f at the grid nodes
+    """
+    def __init__(self, x_values, muF_values, flavs, tabulation):
+        self.x_values = x_values
+        self.muF_values = muF_values
+        self.flavs = flavs
+        self.tabulation = tabulation
+        self.flavmap = dict(zip(flavs, range(len(flavs))))
+        # LHAPDF treats 0 and 21 as equivalent ids for the gluon
+        if (0 in self.flavmap and 21 not in self.flavmap): self.flavmap[21] = self.flavmap[0]
+        if (21 in self.flavmap and 0 not in self.flavmap): self.flavmap[0] = self.flavmap[21]
+
+def read_blocks(stream):
+    "yields a Subgrid for each of the blocks in the (already opened) member file"
+    while True:
+        line = stream.readline()
+        if line.strip() == "": break
+        if not line.startswith("---"): continue
+
+        # get the x, muF and flav arrays
+        x_values = np.array(list(map(float, stream.readline().split())))
+        if (len(x_values) == 0): break
+        muF_values = np.array(list(map(float, stream.readline().split())))
+        flavs = np.array(list(map(int, stream.readline().split())))
+
+        # the rows run over muF fastest, and have one column per flavour
+        rows = [stream.readline() for i in range(len(x_values)*len(muF_values))]
+        tabulation = np.array(" ".join(rows).split(), dtype=float)
+        tabulation = tabulation.reshape(len(x_values), len(muF_values), len(flavs)).transpose(0,2,1)
+        yield Subgrid(x_values, muF_values, flavs, tabulation)
+
+def read_member(pdfset, imem):
+    """returns the list of Subgrids of member imem of pdfset, i.e. the
+    tabulated values at its native grid nodes
+    """
+    with open(member_file(pdfset, imem), 'r') as stream:
+        return list(read_blocks(stream))
+
+
+#----------------------------------------------------------------------
+class NodePDF(object):
+    """\
+    A stand-in for an LHAPDF PDF that returns the tabulated values of a
+    member (a list of Subgrids) directly, without interpolation, for
+    (x, Q) points that coincide with grid nodes, and raises a ValueError
+    for other points. As in LHAPDF, a Q on the boundary between two
+    blocks uses the upper block. Other attributes (alphasQ, xMin, ...)
+    are taken from pdf, if it is supplied.
+    """
+    def __init__(self, subgrids, pdf = None, rtol = 1e-10):
+        self.subgrids = subgrids
+        self.pdf = pdf
+        self.rtol = rtol
+
+    def __getattr__(self, name):
+        if (self.pdf is None): raise AttributeError(name)
+        return getattr(self.pdf, name)
+
+    def _match(self, nodes, values):
+        "returns the indices of the nodes that match values, or None"
+        values = np.asarray(values, dtype=float)
+        i = np.clip(np.searchsorted(nodes, values), 1, len(nodes)-1)
+        i = np.where(np.abs(nodes[i-1] - values) < np.abs(nodes[i] - values), i-1, i)
+        if np.all(np.abs(nodes[i] - values) <= self.rtol * np.abs(values)): return i
+        return None
+
+    def block(self, Q):
+        "returns (subgrid, iQ) for the last block with a node at Q, or None"
+        for subgrid in reversed(self.subgrids):
+            iQ = self._match(subgrid.muF_values, [Q])
+            if iQ is not None: return subgrid, iQ[0]
+        return None
+
+    def node_Qs(self):
+        "returns all the Q nodes (without repetitions)"
+        return np.unique(np.concatenate([subgrid.muF_values for subgrid in self.subgrids]))
+
+    def node_xs(self, Q, xmin = 0.0, xmax = 1.0):
+        "returns the x nodes between xmin and xmax of the block used at Q"
+        subgrid, iQ = self.block(Q)
+        x_values = subgrid.x_values
+        return x_values[(x_values >= xmin*(1-self.rtol)) & (x_values <= xmax*(1+self.rtol))]
+
+    def aligned(self, xs, Qs):
+        "returns True if all the (x, Q) points sit on grid nodes"
+        Qs = np.broadcast_to(np.asarray(Qs, dtype=float), np.shape(xs))
+        for Q in np.unique(Qs):
+            found = self.block(Q)
+            if found is None or self._match(found[0].x_values, np.asarray(xs)[Qs == Q]) is None: return False
+        return True
+
+    def xfxQ_array(self, iflav, xs, Qs):
+        xs = np.asarray(xs, dtype=float)
+        Qs = np.broadcast_to(np.asarray(Qs, dtype=float), xs.shape)
+        res = np.zeros(xs.shape)
+        for Q in np.unique(Qs):
+            sel = (Qs == Q)
+            found = self.block(Q)
+            if found is None: raise ValueError(f"Q = {Q} is not a grid node")
+            subgrid, iQ = found
+            ix = self._match(subgrid.x_values, xs[sel])
+            if ix is None: raise ValueError(f"some x values at Q = {Q} are not grid nodes")
+            # flavours absent from the grid are zero, as in LHAPDF
+            if int(iflav) in subgrid.flavmap:
+                res[sel] = subgrid.tabulation[ix, subgrid.flavmap[int(iflav)], iQ]
+        return res
+
+    def xfxQ(self, iflav, x, Q):
+        return float(self.xfxQ_array(iflav, [x], Q)[0])
+
 
 def main():
 
@@ -28,52 +175,30 @@ def main():
     args = parser.parse_args()
     print(args.pdfset)
 
-    pdf_dir = data_dir + '/' + args.pdfset
+    pdf_dir = set_dir(args.pdfset)
     print("# data_dir = ", data_dir)
     print("# pdf_dir = ", pdf_dir)
 
-    info_file = f'{pdf_dir}/{args.pdfset}.info'
-    with open(info_file, 'r') as stream:
-        info = yaml.safe_load(stream)
-        print("#", info.keys())
-
-    data_file = f'{pdf_dir}/{args.pdfset}_0000.dat'    
-    with open(data_file, 'r') as stream:
-        
-        iblock = -1
-        while True:
-            line = stream.readline()
-            if line.strip() == "": break
-            if not line.startswith("---"): continue
-
-            iblock += 1
-            if args.block is not None and iblock != args.block: continue
-
-            # get the x, muF and flav arrays
-            x_values = np.array(list(map(float, stream.readline().split())))
-            if (len(x_values) == 0): break
-            #print("# x_values = ", x_values)
-            muF_values = np.array(list(map(float, stream.readline().split())))
-            print("# muF_values = ", muF_values)
-            flavs = np.array(list(map(int, stream.readline().split())))
-            print("# flavs = ", flavs)
-
-            tabulation = np.zeros((len(x_values), len(flavs), len(muF_values)))
-            flavmap = dict(zip(flavs, range(len(flavs))))
-            #print("# flavmap = ", flavmap)
-            print("# tabulation.shape = ", tabulation.shape)
-            for ix in range(len(x_values)):
-                for imu in range(len(muF_values)):
-                    tabulation[ix, :, imu] = np.array(list(map(float, stream.readline().split())))
-
-            print(f"# tabulated PDF at muF={muF_values[args.iQ]}: ", end="")
-            if args.flav == 0:
-                print(f"x {[iflv for iflv in flavs]}")
-                print(reformat(x_values, *[tabulation[:,iflv,args.iQ] for iflv in range(len(flavs))]))
-            else:
-                print(f"x {args.flav}")
-                print(reformat(x_values, tabulation[:,flavmap[args.flav],args.iQ]))
+    info = read_info(args.pdfset)
+    print("#", info.keys())
+
+    subgrids = read_member(args.pdfset, 0)
+    for iblock, subgrid in enumerate(subgrids):
+        if args.block is not None and iblock != args.block: continue
+
+        x_values, muF_values, flavs = subgrid.x_values, subgrid.muF_values, subgrid.flavs
+        tabulation = subgrid.tabulation
+        print("# muF_values = ", muF_values)
+        print("# flavs = ", flavs)
+        print("# tabulation.shape = ", tabulation.shape)
 
+        print(f"# tabulated PDF at muF={muF_values[args.iQ]}: ", end="")
+        if args.flav == 0:
+            print(f"x {[iflv for iflv in flavs]}")
+            print(reformat(x_values, *[tabulation[:,iflv,args.iQ] for iflv in range(len(flavs))]))
+        else:
+            print(f"x {args.flav}")
+            print(reformat(x_values, tabulation[:,subgrid.flavmap[args.flav],args.iQ]))
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Bayesian reweighting of a replica set with new data. Usage:
+
+    ./reweight.py -pdf PDF -theory THEORY -data DATA [-cov COV] [-method nnpdf|gk] \\
+                  [-weights-out FILE] [-out OUT]
+
+THEORY holds the prediction for each of the nobs observables (rows) and
+each member (columns, including member 0), as a .npy array of shape
+(nobs, nmem) or as text; e.g. the array returned by xsec.convolute,
+reshaped to (-1, nmem). DATA has the measured values in its first
+column and, if COV (a text or .npy nobs x nobs matrix) is not given,
+their uncorrelated uncertainties in the second.
+
+The chi2 of each replica is obtained for all replicas at once with the
+Cholesky decomposition of the covariance, and the weights are
+
+    nnpdf: w_k ∝ chi2_k^((nobs-1)/2) exp(-chi2_k/2)
+    gk   : w_k ∝ exp(-chi2_k/2)                        (Giele-Keller)
+
+normalised to sum to the number of replicas. The output lists the chi2
+and weight of each replica, preceded by the effective number of
+replicas, N_eff = exp(sum_k (w_k/N) ln(N/w_k)), and the unweighted and
+reweighted predictions. With -weights-out, the weights are also written
+to a file that can be given as -weights FILE to pdf.py, lumi.py and
+mom.py, whose -err uncertainties (and -medianerr intervals) are then
+those of the reweighted set.
+"""
+import argparse
+from pdf_base import *
+
+
+#----------------------------------------------------------------------
+def chi2(theory, data, cov):
+    """returns an array with the chi2 of each column of theory, of shape
+    (nobs, nmem), with respect to data, given their covariance matrix
+    """
+    theory = np.asarray(theory, dtype=float)
+    diff = theory - np.asarray(data, dtype=float)[:,np.newaxis]
+    # with cov = L L^T, chi2 = |L^{-1} diff|^2
+    L = np.linalg.cholesky(np.asarray(cov, dtype=float))
+    z = np.linalg.solve(L, diff)
+    return (z**2).sum(axis=0)
+
+
+def weights_from_chi2(chi2s, nobs, method = "nnpdf"):
+    """returns the weights for replicas with the given chi2 values,
+    normalised so that they sum to the number of replicas
+    """
+    chi2s = np.asarray(chi2s, dtype=float)
+    if   (method == "nnpdf"): logw = 0.5*(nobs-1)*np.log(chi2s) - 0.5*chi2s
+    elif (method == "gk"   ): logw = -0.5*chi2s
+    else: raise ValueError("unknown reweighting method "+method)
+    # work with logarithms to avoid underflow at large chi2
+    w = np.exp(logw - logw.max())
+    return w * len(w) / w.sum()
+
+
+def n_eff(weights):
+    "returns the effective number of replicas, from the Shannon entropy of the weights"
+    weights = np.asarray(weights, dtype=float)
+    p = weights / weights.sum()
+    p = p[p > 0]
+    return np.exp(-(p*np.log(p)).sum())
+
+
+def write_weights(filename, weights, chi2s = None):
+    "writes the weights (one per replica) in .npy format or as text"
+    if (filename.endswith(".npy")):
+        np.save(filename, weights)
+    elif (chi2s is None):
+        np.savetxt(filename, np.column_stack((np.arange(1, len(weights)+1), weights)),
+                   fmt=["%d", "%.10g"], header="Columns: imem weight")
+    else:
+        np.savetxt(filename, np.column_stack((np.arange(1, len(weights)+1), chi2s, weights)),
+                   fmt=["%d", "%.10g", "%.10g"], header="Columns: imem chi2 weight")
+
+
+def read_weights(filename, pdfset):
+    """returns the weights from filename (as written by write_weights, the
+    weight being in the last column), checking them against the pdfset
+    """
+    if (filename.endswith(".npy")):
+        weights = np.load(filename)
+    else:
+        weights = np.loadtxt(filename, ndmin=2)[:,-1]
+    if (pdfset.errorType != "replicas"):
+        raise ValueError("weights can only be used with replica sets, not "+pdfset.errorType)
+    if (len(weights) != pdfset.size-1):
+        raise ValueError("{} has {} weights, but {} has {} replicas".format(
+            filename, len(weights), pdfset.name, pdfset.size-1))
+    return weights
+
+
+#----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='Reweight a replica set with new data')
+    parser.add_argument('-pdf', type=str, required=True, help='PDF name (a replica set)')
+    parser.add_argument('-theory', type=str, required=True, help='Predictions, shape (nobs, nmem), as .npy or text')
+    parser.add_argument('-data', type=str, required=True, help='Data values (and uncorrelated errors, without -cov)')
+    parser.add_argument('-cov', type=str, default="", help='Data covariance matrix, as .npy or text')
+    parser.add_argument('-method', type=str, default="nnpdf", choices=["nnpdf", "gk"], help='Form of the weights')
+    parser.add_argument('-medianerr', action='store_true', help='use a median + interval uncertainty')
+    parser.add_argument('-weights-out', type=str, default="", help='Write the weights to this file (.npy or text)')
+
+    parser.add_argument('-out', '-o', type=str, dest="out", default="", help='Output file (default is stdout)')
+    parser.add_argument('-prec', type=int, default=5, help='Number of digits of precision in printout (default 5)')
+
+    args = parser.parse_args()
+
+    if (args.out != ""):
+        out = open(args.out,'w')
+    else:
+        out = sys.stdout
+    format="{{:<{}.{}g}}".format(args.prec+7,args.prec)
+
+    pdfset = lhapdf.getPDFSet(args.pdf)
+    if (pdfset.errorType != "replicas"):
+        raise ValueError("{} is a {} set; reweighting needs replicas".format(args.pdf, pdfset.errorType))
+
+    theory = np.load(args.theory) if args.theory.endswith(".npy") else np.loadtxt(args.theory, ndmin=2)
+    if (theory.shape[1] != pdfset.size):
+        raise ValueError("{} has {} columns, but {} has {} members".format(
+            args.theory, theory.shape[1], args.pdf, pdfset.size))
+    data = np.loadtxt(args.data, ndmin=2)
+    if (args.cov != ""):
+        cov = np.load(args.cov) if args.cov.endswith(".npy") else np.loadtxt(args.cov, ndmin=2)
+    else:
+        cov = np.diag(data[:,1]**2)
+    data = data[:,0]
+    nobs = len(data)
+
+    chi2s = chi2(theory[:,1:], data, cov)
+    weights = weights_from_chi2(chi2s, nobs, args.method)
+    if (args.weights_out != ""): write_weights(args.weights_out, weights, chi2s)
+
+    prior     = bulkUncert(pdfset, theory, args.medianerr)
+    posterior = bulkUncert(pdfset, theory, args.medianerr, weights)
+
+    print("#", " ".join(sys.argv), file=out)
+    print(f"# pdf = {args.pdf}, version = {pdfset.dataversion}, method = {args.method}", file=out)
+    print("# nobs = {}, nrep = {}, N_eff = {:.4g}".format(nobs, len(weights), n_eff(weights)), file=out)
+    print("# chi2/nobs: member 0 = {:.4g}, prior = {:.4g}, reweighted = {:.4g}".format(
+        chi2(theory[:,0:1], data, cov)[0]/nobs,
+        chi2(prior.central[:,np.newaxis], data, cov)[0]/nobs,
+        chi2(posterior.central[:,np.newaxis], data, cov)[0]/nobs), file=out)
+    print("# Columns: iobs data prior errsymm reweighted errsymm", file=out)
+    print(reformat(np.arange(nobs), np.column_stack((data, prior.central, prior.errsymm,
+                                                     posterior.central, posterior.errsymm)), format=format), file=out)
+    print("# Columns: imem chi2 weight", file=out)
+    print(reformat(np.arange(1, len(weights)+1), np.column_stack((chi2s, weights)), format=format), file=out)
+
+
+if __name__ == '__main__': main()
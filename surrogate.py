@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Chebyshev surrogates for repeated evaluation of a PDF member at fixed Q. Usage:
+
+    ./surrogate.py [-pdf PDF] [-imem IMEM] [-flav 21,2,...] [-Q Q] [-tol TOL] [-xmin XMIN]
+
+prints the degree and fit error of the surrogate for each flavour.
+
+Each (member, flavour, Q) slice of x*f(x,Q) is fitted, for xmin < x < xmax,
+by a Chebyshev expansion in the stretched variable zeta of pdf.py, with
+the degree doubled until the error at the mid-points between the nodes
+is below tol (relative to the largest |x*f|). Fits are cached in memory
+and on disk (in $PYPDFS_CACHE, by default ~/.cache/pypdfs), and later
+evaluations are pure vectorised polynomial evaluations. For use in
+existing code, wrap a PDF as
+
+    spdf = SurrogatePDF(pdf, tol = 1e-6)
+
+and pass spdf instead of pdf, e.g. to lumi.lumi(); spdf.max_fit_error()
+gives the largest fit error of the surrogates used so far. Points outside
+the fitted x range (or the PDF's Q range) are passed on to the PDF.
+"""
+import argparse
+import os
+from numpy.polynomial import chebyshev
+from pdf_base import *
+import pdf as mypdf
+
+
+#----------------------------------------------------------------------
+class ChebyshevSurrogate(object):
+    """\
+    x*f(x) at fixed member, flavour and Q, as a Chebyshev expansion in
+    zeta = ln(1/x) + a_stretch*(1-x), valid for zeta_lo < zeta < zeta_hi.
+    fit_error is the largest deviation found at the check points,
+    relative to the largest |x*f|.
+    """
+    def __init__(self, coeffs, zeta_lo, zeta_hi, a_stretch, fit_error):
+        self.coeffs = np.asarray(coeffs)
+        self.zeta_lo = zeta_lo
+        self.zeta_hi = zeta_hi
+        self.a_stretch = a_stretch
+        self.fit_error = fit_error
+
+    def _t_of_zeta(self, zeta):
+        return (2*zeta - (self.zeta_hi + self.zeta_lo)) / (self.zeta_hi - self.zeta_lo)
+
+    def _zeta_of_t(self, t):
+        return 0.5*(self.zeta_hi + self.zeta_lo) + 0.5*(self.zeta_hi - self.zeta_lo)*t
+
+    def covers(self, x):
+        "returns whether each of the (array of) x values is inside the fitted range"
+        zeta = mypdf.zeta_of_x(np.asarray(x, dtype=float), self.a_stretch)
+        margin = 1e-12 * (self.zeta_hi - self.zeta_lo)
+        return (zeta >= self.zeta_lo - margin) & (zeta <= self.zeta_hi + margin)
+
+    def __call__(self, x):
+        "returns x*f at the (array of) x values, which must be inside the fitted range"
+        if (not np.all(self.covers(x))):
+            raise ValueError("x outside the range {:.6g} < x < {:.6g} of the surrogate".format(
+                mypdf.x_of_zeta(self.zeta_hi, self.a_stretch), mypdf.x_of_zeta(self.zeta_lo, self.a_stretch)))
+        return chebyshev.chebval(self._t_of_zeta(mypdf.zeta_of_x(x, self.a_stretch)), self.coeffs)
+
+
+def fit(pdf, iflav, Q, xmin, xmax = 1.0, tol = 1e-6, a_stretch = 5.0, min_degree = 16, max_degree = 1024):
+    """returns a ChebyshevSurrogate for x*f(x,Q) of the given pdf and
+    flavour, increasing the degree until the fit error is below tol
+    (or max_degree is reached)
+    """
+    surrogate = ChebyshevSurrogate(None, mypdf.zeta_of_x(xmax, a_stretch), mypdf.zeta_of_x(xmin, a_stretch), a_stretch, None)
+    xf = lambda t: xfxQ_array(pdf, iflav, [mypdf.x_of_zeta(zeta, a_stretch) for zeta in surrogate._zeta_of_t(t)], Q)
+
+    degree = min_degree
+    while True:
+        # interpolate at the Chebyshev nodes (of the first kind)
+        nodes = np.cos(np.pi * (np.arange(degree+1) + 0.5) / (degree+1))
+        coeffs = chebyshev.chebfit(nodes, xf(nodes), degree)
+        # and check at the points half-way between them
+        checks = np.cos(np.pi * np.arange(1, degree+1) / (degree+1))
+        exact = xf(checks)
+        scale = max(np.max(np.abs(exact)), 1e-300)
+        fit_error = np.max(np.abs(chebyshev.chebval(checks, coeffs) - exact)) / scale
+        if (fit_error < tol or degree >= max_degree): break
+        degree *= 2
+
+    # drop trailing coefficients that are negligible at this tolerance
+    tail = np.cumsum(np.abs(coeffs[::-1]))[::-1]
+    nkeep = max(1, np.count_nonzero(tail > 0.1 * tol * scale))
+    surrogate.coeffs = coeffs[:nkeep]
+    surrogate.fit_error = fit_error + tail[nkeep]/scale if nkeep < len(coeffs) else fit_error
+    return surrogate
+
+
+#----------------------------------------------------------------------
+_cache = {}
+
+def cache_dir():
+    return os.environ.get("PYPDFS_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "pypdfs"))
+
+def get_surrogate(pdf, iflav, Q, xmin = None, xmax = 1.0, tol = 1e-6, a_stretch = 5.0, disk_cache = True):
+    """returns the (cached) ChebyshevSurrogate for the given LHAPDF pdf,
+    flavour and Q, fitting it if it is not in the memory or disk cache
+    """
+    if (xmin is None): xmin = pdf.xMin
+    pdfset = pdf.set()
+    key = (pdfset.name, pdfset.dataversion, pdf.memberID, int(iflav), float(Q), float(xmin), float(xmax), tol, a_stretch)
+    if key in _cache: return _cache[key]
+
+    filename = os.path.join(cache_dir(), "{}_v{}_{:04d}_{}_{:.10g}_{:.6g}_{:.6g}_{:.1e}_{:g}.npz".format(*key))
+    if (disk_cache and os.path.exists(filename)):
+        with np.load(filename) as data:
+            surrogate = ChebyshevSurrogate(data["coeffs"], float(data["zeta_lo"]), float(data["zeta_hi"]),
+                                           a_stretch, float(data["fit_error"]))
+    else:
+        surrogate = fit(pdf, iflav, Q, xmin, xmax, tol, a_stretch)
+        if (disk_cache):
+            os.makedirs(cache_dir(), exist_ok=True)
+            np.savez(filename, coeffs=surrogate.coeffs, zeta_lo=surrogate.zeta_lo,
+                     zeta_hi=surrogate.zeta_hi, fit_error=surrogate.fit_error)
+    _cache[key] = surrogate
+    return surrogate
+
+
+class SurrogatePDF(object):
+    """\
+    A stand-in for an LHAPDF PDF whose xfxQ and xfxQ_array use the
+    Chebyshev surrogates for each (flavour, Q) that is requested; all
+    other attributes (xMin, alphasQ, ...) are those of the PDF. Points
+    outside the fitted x range, or with Q outside the PDF's own range
+    (where LHAPDF extrapolates), are evaluated with the PDF itself.
+    """
+    def __init__(self, pdf, tol = 1e-6, xmin = None, xmax = 1.0, a_stretch = 5.0, disk_cache = True):
+        self.pdf = pdf
+        self.tol = tol
+        self.xmin = xmin
+        self.xmax = xmax
+        self.a_stretch = a_stretch
+        self.disk_cache = disk_cache
+        self.surrogates = {}
+
+    def __getattr__(self, name):
+        return getattr(self.pdf, name)
+
+    def surrogate(self, iflav, Q):
+        key = (int(iflav), float(Q))
+        if key not in self.surrogates:
+            self.surrogates[key] = get_surrogate(self.pdf, iflav, Q, self.xmin, self.xmax, self.tol,
+                                                 self.a_stretch, self.disk_cache)
+        return self.surrogates[key]
+
+    def in_Q_range(self, Q):
+        "returns whether Q is inside the range of the PDF's grid"
+        return getattr(self.pdf, "q2Min", 0.0) <= Q*Q <= getattr(self.pdf, "q2Max", np.inf)
+
+    def xfxQ(self, iflav, x, Q):
+        return float(self.xfxQ_array(iflav, [x], Q)[0])
+
+    def xfxQ_array(self, iflav, xs, Qs):
+        xs = np.asarray(xs, dtype=float)
+        Qs = np.broadcast_to(np.asarray(Qs, dtype=float), xs.shape)
+        res = np.empty(xs.shape)
+        for Q in np.unique(Qs):
+            sel = (Qs == Q)
+            inside = sel & self.surrogate(iflav, Q).covers(xs) if self.in_Q_range(Q) else np.zeros(xs.shape, dtype=bool)
+            if (inside.any()): res[inside] = self.surrogate(iflav, Q)(xs[inside])
+            outside = sel & ~inside
+            if (outside.any()): res[outside] = xfxQ_array(self.pdf, iflav, xs[outside], Q)
+        return res
+
+    def max_fit_error(self):
+        "returns the largest fit error among the surrogates used so far"
+        return max([s.fit_error for s in self.surrogates.values()], default=0.0)
+
+
+#----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='Fit Chebyshev surrogates and report their degree and accuracy')
+    parser.add_argument('-pdf', type=str, default=default_pdf, help='PDF name')
+    parser.add_argument('-imem', type=int, default=0, help='The member to fit')
+    parser.add_argument('-flav', '-flv', type=str, default='21,1,2,-1,-2', help='Comma-separated list of PDG IDs')
+    parser.add_argument('-Q', type=float, default=100.0, help='Q')
+    parser.add_argument('-tol', type=float, default=1e-6, help='Target fit error, relative to the largest |x*f|')
+    parser.add_argument('-xmin', type=float, default=None, help='xmin (default is the PDF xMin)')
+    parser.add_argument('-a-stretch', type=float, default=5.0, help='Stretching of large-x region in zeta')
+    parser.add_argument('-no-disk-cache', action='store_true', help='Do not read or write the disk cache')
+    args = parser.parse_args()
+
+    pdf = lhapdf.getPDFSet(args.pdf).mkPDF(args.imem)
+    print("#", " ".join(sys.argv))
+    print("# Columns: flav ncoeffs fit_error")
+    for flav in args.flav.split(','):
+        surrogate = get_surrogate(pdf, int(flav), args.Q, args.xmin, 1.0, args.tol, args.a_stretch,
+                                  not args.no_disk_cache)
+        print(flav, len(surrogate.coeffs), "{:.3g}".format(surrogate.fit_error))
+
+
+if __name__ == '__main__': main()
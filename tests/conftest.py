@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the scripts live in the top-level directory
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
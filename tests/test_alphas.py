@@ -0,0 +1,47 @@
+import pytest
+np = pytest.importorskip("numpy")
+pytest.importorskip("yaml")
+import alphas
+from pdf_base import lhapdf, default_pdf
+
+
+def test_ipol_matches_lhapdf_in_every_subgrid():
+    if lhapdf is None: pytest.skip("needs lhapdf")
+    pdfset = lhapdf.getPDFSet(default_pdf)
+    pdf = pdfset.mkPDF(0)
+    evaluator = alphas.alphas_evaluator(pdfset, 0)
+    if not isinstance(evaluator, alphas.alphasIpol):
+        pytest.skip("set does not use ipol alphas")
+    for q2_hi, logq2, vals, derivs in evaluator.subgrids:
+        # the nodes and the mid-points between them, including the top subgrid
+        logq2_mid = 0.5*(logq2[1:] + logq2[:-1])
+        Qs = np.exp(0.5*np.concatenate((logq2, logq2_mid)))
+        expected = np.array([pdf.alphasQ(Q) for Q in Qs])
+        assert np.allclose(evaluator.alphasQ(Qs), expected, rtol=1e-10, atol=0)
+
+
+def test_ipol_on_synthetic_grid():
+    # a one-loop-like running with a discontinuity at the threshold Q = 5
+    smooth = lambda Q, b: 1/(b*np.log(Q**2/0.04))
+    Qlo = np.exp(np.linspace(np.log(1.0), np.log(5.0), 30))
+    Qhi = np.exp(np.linspace(np.log(5.0), np.log(1000.0), 60))
+    Qs = np.concatenate((Qlo, Qhi))
+    vals = np.concatenate((smooth(Qlo, 0.7), smooth(Qhi, 0.6)))
+    evaluator = alphas.alphasIpol(Qs, vals)
+    assert len(evaluator.subgrids) == 2
+
+    # the nodes, with the threshold taking the value of the subgrid above it
+    assert np.allclose(evaluator.alphasQ(Qlo[:-1]), vals[:len(Qlo)-1], rtol=1e-14, atol=0)
+    assert np.allclose(evaluator.alphasQ(Qhi), vals[len(Qlo):], rtol=1e-14, atol=0)
+
+    # between the nodes, close to the smooth function
+    Qmid = np.sqrt(Qhi[1:]*Qhi[:-1])
+    assert np.allclose(evaluator.alphasQ(Qmid), smooth(Qmid, 0.6), rtol=1e-4, atol=0)
+    Qmid = np.sqrt(Qlo[1:]*Qlo[:-1])
+    assert np.allclose(evaluator.alphasQ(Qmid), smooth(Qmid, 0.7), rtol=1e-3, atol=0)
+
+    # constant above the grid and a power law in Q^2 below it
+    assert np.allclose(evaluator.alphasQ([2000.0, 1e5]), vals[-1])
+    power = np.log10(vals[1]/vals[0]) / np.log10((Qs[1]/Qs[0])**2)
+    Qbelow = np.array([0.5, 0.9])
+    assert np.allclose(evaluator.alphasQ(Qbelow), vals[0] * Qbelow**(2*power))
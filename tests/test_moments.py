@@ -0,0 +1,34 @@
+import math
+import pytest
+np = pytest.importorskip("numpy")
+import mom
+import moments
+
+
+class stubPDF(object):
+    "x*f = (1 + 0.1*iflav) x^0.3 (1-x)^3 (1 + log(Q)/10) for every flavour"
+    xMin = 1e-6
+
+    def xfxQ(self, iflav, x, Q):
+        return (1 + 0.1*iflav) * x**0.3 * (1-x)**3 * (1 + math.log(Q)/10)
+
+
+def test_N2_matches_mom():
+    pdf = stubPDF()
+    xvals, dy = mom.mom_grid(-math.log(pdf.xMin))
+    weights = moments.mellin_weights([2], xvals, dy)
+    xf = np.array([pdf.xfxQ(21, x, 100.0) for x in xvals])
+    assert np.isclose((weights @ xf)[0], mom.mom(pdf, 100.0, 21), rtol=1e-12)
+
+
+def test_moments_of_all_flavours_and_Q():
+    pdf = stubPDF()
+    Qvals = [10.0, 100.0]
+    res = moments.moments([pdf], [2, 3], [1, 21], Qvals)
+    assert res.shape == (2, 2, 2, 1)
+    for iflav, flav in enumerate([1, 21]):
+        for iQ, Q in enumerate(Qvals):
+            assert np.isclose(res[0,iflav,iQ,0], mom.mom(pdf, Q, flav), rtol=1e-12)
+    # <x> = int dx x*f = (1 + 0.1*iflav) (1 + log(Q)/10) B(1.3, 4), to the accuracy of the quadrature
+    beta = math.gamma(1.3) * math.gamma(4) / math.gamma(5.3)
+    assert np.isclose(res[0,1,1,0], 3.1 * (1 + math.log(100.0)/10) * beta, rtol=1e-3)
@@ -0,0 +1,121 @@
+import pytest
+np = pytest.importorskip("numpy")
+import pdf_base
+
+
+class stubSet(object):
+    "the attributes of an LHAPDF PDFSet that the uncertainty code uses"
+    def __init__(self, errorType, errorConfLevel = 68.268949):
+        self.errorType = errorType
+        self.errorConfLevel = errorConfLevel
+
+
+def members(nmem, npoints = 6, seed = 1):
+    rng = np.random.default_rng(seed)
+    return 1.0 + 0.1*rng.standard_normal((npoints, nmem))
+
+
+def test_bulkUncert_replicas():
+    values = members(51)
+    uncert = pdf_base.bulkUncert(stubSet("replicas"), values)
+    assert np.allclose(uncert.central, values[:,1:].mean(axis=1))
+    assert np.allclose(uncert.errsymm, values[:,1:].std(axis=1, ddof=1))
+
+
+def test_bulkUncert_medianerr_matches_intervalUncert():
+    values = members(101)
+    uncert = pdf_base.bulkUncert(stubSet("replicas"), values, medianerr=True)
+    for ipoint in range(len(values)):
+        ref = pdf_base.intervalUncert(values[ipoint])
+        assert np.isclose(uncert.central[ipoint], ref.central)
+        assert np.isclose(uncert.errplus[ipoint],  ref.errplus)
+        assert np.isclose(uncert.errminus[ipoint], ref.errminus)
+
+
+def test_bulkUncert_hessian():
+    values = members(21)
+    uncert = pdf_base.bulkUncert(stubSet("hessian"), values)
+    for ipoint, row in enumerate(values):
+        plus  = row[1::2] - row[0]
+        minus = row[2::2] - row[0]
+        errplus  = np.sqrt(sum(max(p, m, 0)**2 for p, m in zip(plus, minus)))
+        errminus = np.sqrt(sum(max(-p, -m, 0)**2 for p, m in zip(plus, minus)))
+        assert np.isclose(uncert.central[ipoint], row[0])
+        assert np.isclose(uncert.errplus[ipoint], errplus)
+        assert np.isclose(uncert.errminus[ipoint], errminus)
+        assert np.isclose(uncert.errsymm[ipoint], 0.5*np.sqrt(((row[1::2] - row[2::2])**2).sum()))
+
+
+def test_bulkUncert_rescales_to_68cl():
+    values = members(21)
+    at68 = pdf_base.bulkUncert(stubSet("symmhessian"), values)
+    at90 = pdf_base.bulkUncert(stubSet("symmhessian", 90.0), values)
+    assert np.allclose(at90.errsymm, at68.errsymm / 1.6448536)
+    assert np.allclose(at68.errsymm, np.sqrt(((values[:,1:] - values[:,0:1])**2).sum(axis=1)))
+
+
+def test_weightedUncert():
+    values = members(41)
+    weights = np.random.default_rng(2).random(40)
+    uncert = pdf_base.weightedUncert(values, weights)
+    mean = np.average(values[:,1:], axis=1, weights=weights)
+    V1, V2 = weights.sum(), (weights**2).sum()
+    variance = (weights * (values[:,1:] - mean[:,np.newaxis])**2).sum(axis=1) / (V1 - V2/V1)
+    assert np.allclose(uncert.central, mean)
+    assert np.allclose(uncert.errsymm, np.sqrt(variance))
+
+    # equal weights give back the unweighted results
+    equal = pdf_base.bulkUncert(stubSet("replicas"), values, weights=np.full(40, 3.0))
+    plain = pdf_base.bulkUncert(stubSet("replicas"), values)
+    assert np.allclose(equal.central, plain.central)
+    assert np.allclose(equal.errsymm, plain.errsymm)
+
+
+@pytest.mark.parametrize("errtype, nmem", [("replicas", 51), ("hessian", 21), ("symmhessian", 21)])
+def test_covariance_diagonal(errtype, nmem):
+    pdfset = stubSet(errtype, 90.0)
+    values = members(nmem)
+    cov = pdf_base.covariance(pdfset, values, chunk=3)
+    assert np.allclose(np.diag(cov), pdf_base.bulkUncert(pdfset, values).errsymm**2)
+    assert np.allclose(np.diag(pdf_base.correlation(cov)), 1.0)
+
+
+def test_weighted_covariance_diagonal():
+    pdfset = stubSet("replicas")
+    values = members(51)
+    weights = np.random.default_rng(3).random(50)
+    cov = pdf_base.covariance(pdfset, values, weights)
+    assert np.allclose(np.diag(cov), pdf_base.bulkUncert(pdfset, values, weights=weights).errsymm**2)
+    assert np.allclose(cov, np.cov(values[:,1:], aweights=weights))
+
+
+def test_compactMembers_round_trip():
+    values = members(31, npoints=12).reshape(3, 4, 31)
+    compact = pdf_base.member_array([3, 4], 31, compact=True)
+    for imem in range(31): compact[:,:,imem] = values[:,:,imem]
+    # the float32 differences from member 0 lose at most ~1e-7 of their size
+    tolerance = 1e-6 * np.abs(values - values[:,:,0:1]).max()
+    assert np.array_equal(compact[:,:,0], values[:,:,0])
+    assert np.allclose(compact[:,:,:], values, rtol=0, atol=tolerance)
+    assert np.allclose(compact[1,2,:], values[1,2,:], rtol=0, atol=tolerance)
+    assert np.allclose(compact[:,1,-1], values[:,1,-1], rtol=0, atol=tolerance)
+    assert np.allclose(compact[:,:,5:9], values[:,:,5:9], rtol=0, atol=tolerance)
+
+    flat = compact.reshape(12, 31)
+    assert np.allclose(flat[:,:], values.reshape(12, 31), rtol=0, atol=tolerance)
+    pdfset = stubSet("replicas")
+    assert np.allclose(pdf_base.bulkUncert(pdfset, compact).errsymm, pdf_base.bulkUncert(pdfset, values).errsymm)
+    assert np.allclose(pdf_base.covariance(pdfset, flat), pdf_base.covariance(pdfset, values.reshape(12, 31)))
+
+
+def test_cubic_interp_uniform():
+    y0, dy = 0.5, 0.25
+    nodes = y0 + dy*np.arange(12)
+    quadratic = lambda y: 3*y**2 - y + 2
+    # exact at the nodes, and for a quadratic away from the edge intervals
+    assert np.allclose(pdf_base.cubic_interp_uniform(np.sin(nodes), y0, dy, nodes), np.sin(nodes))
+    y = np.linspace(nodes[1], nodes[-2], 57)
+    assert np.allclose(pdf_base.cubic_interp_uniform(quadratic(nodes), y0, dy, y), quadratic(y))
+    # several rows at once
+    table = np.array([quadratic(nodes), 2*quadratic(nodes)])
+    assert np.allclose(pdf_base.cubic_interp_uniform(table, y0, dy, y), [quadratic(y), 2*quadratic(y)])
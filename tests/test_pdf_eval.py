@@ -0,0 +1,19 @@
+import os
+import subprocess
+import sys
+import pytest
+np = pytest.importorskip("numpy")
+pytest.importorskip("lhapdf")
+from conftest import repo_dir
+
+
+def run_pdf(*args):
+    out = subprocess.run([sys.executable, os.path.join(repo_dir, "pdf.py"), "-Q", "100", "-nx", "5", "-prec", "12"] + list(args),
+                         check=True, capture_output=True, text=True).stdout
+    return np.loadtxt(out.splitlines())
+
+
+def test_eval_can_use_x_and_Q():
+    plain = run_pdf("-flav", "21")
+    evaluated = run_pdf("-eval", "flv(21)/x*Q/100.0+0*pi")
+    assert np.allclose(evaluated[:,1], plain[:,1]/plain[:,0])
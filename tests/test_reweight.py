@@ -0,0 +1,40 @@
+import pytest
+np = pytest.importorskip("numpy")
+import reweight
+
+
+def test_chi2_with_diagonal_covariance():
+    rng = np.random.default_rng(1)
+    data = rng.random(5)
+    sigma = 0.1 + rng.random(5)
+    theory = data[:,np.newaxis] + rng.standard_normal((5, 8))
+    expected = (((theory - data[:,np.newaxis]) / sigma[:,np.newaxis])**2).sum(axis=0)
+    assert np.allclose(reweight.chi2(theory, data, np.diag(sigma**2)), expected)
+
+
+def test_weights_from_chi2():
+    chi2s = np.array([3.0, 5.0, 8.0, 12.0])
+    nobs = 4
+    for method, expected in (("gk",    np.exp(-0.5*chi2s)),
+                             ("nnpdf", chi2s**(0.5*(nobs-1)) * np.exp(-0.5*chi2s))):
+        weights = reweight.weights_from_chi2(chi2s, nobs, method)
+        assert np.isclose(weights.sum(), len(chi2s))
+        assert np.allclose(weights, expected * len(chi2s) / expected.sum())
+    with pytest.raises(ValueError):
+        reweight.weights_from_chi2(chi2s, nobs, "unknown")
+
+
+def test_weights_from_large_chi2():
+    # exp(-chi2/2) alone would underflow
+    chi2s = np.array([5000.0, 5002.0, 6000.0])
+    weights = reweight.weights_from_chi2(chi2s, 1000)
+    assert np.all(np.isfinite(weights))
+    assert np.isclose(weights.sum(), 3.0)
+    logw = 0.5*999*np.log(chi2s) - 0.5*chi2s
+    assert np.allclose(np.log(weights[1:]/weights[0]), logw[1:] - logw[0])
+
+
+def test_n_eff():
+    assert np.isclose(reweight.n_eff(np.ones(100)), 100.0)
+    assert np.isclose(reweight.n_eff([0.0, 0.0, 3.0]), 1.0)
+    assert np.isclose(reweight.n_eff([2.0, 2.0, 0.0, 0.0]), 2.0)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Accuracy versus cost of the integration settings and evaluation
+backends of lumi.lumi, mom.mom and lumi.dlumi_map. Usage:
+
+    ./validate.py [-pdf PDF] [-imem IMEM] [-quantities lumi,mom,rapdist] [-backends lhapdf,surrogate,table] \\
+                  [-dy-min 0.4,0.2,0.1,0.05] [-ny-min 25,50,100,200] [-nsub 1,2,4,8] [-dy-table 0.08,0.04,0.02,0.01] \\
+                  [-rts RTS] [-mass-lo LO] [-mass-hi HI] [-nmass N] [-flav1 F1] [-flav2 F2] [-eval STRING] [-mu MU] \\
+                  [-Q-lo LO] [-Q-hi HI] [-nQ N] [-flav F] [-ny N] [-tol TOL] [-pareto-only] [-out OUT]
+
+The rapdist quantity is the lumi in -ny rapidity bins spanning the range
+of the lowest mass, integrated with -nsub mid-points per bin (cf.
+xsec.py). For each quantity, every configuration is compared with a
+reference run (the lhapdf backend with -ref-dy-min and -ref-ny-min, or,
+for rapdist, with -ref-nsub points per bin) and the output gives its largest relative
+error over the masses (or Q values), its wall time and the number of
+calls to LHAPDF (including those for fitting surrogates or filling
+tables, which are redone for each configuration). The backends are
+
+  lhapdf     the PDF itself
+  surrogate  surrogate.SurrogatePDF, with tolerance -surrogate-tol
+  table      LnxTable interpolation with spacing -dy-table
+             (lumi: via lumi_multi_rts; rapdist: needs a fixed -mu)
+
+The lumi and mom configurations sweep -dy-min and -ny-min, the rapdist
+ones -nsub, and the table ones also -dy-table.
+
+The pareto_time and pareto_calls columns flag the configurations that
+no other one beats in both accuracy and time (or calls); for each
+quantity, the cheapest configuration with an error below -tol is also
+reported. For rapdist the error is relative to the largest value at
+each mass, so that the tails of the distribution do not dominate.
+"""
+import argparse
+import time
+from itertools import product
+from math import log, sqrt
+from pdf_base import *
+import lumi
+import mom
+import surrogate
+
+
+#----------------------------------------------------------------------
+class countingPDF(object):
+    """\
+    A wrapper around a PDF that counts the number of x*f evaluations, in
+    self.ncalls; all other attributes are those of the PDF.
+    """
+    def __init__(self, pdf):
+        self.pdf = pdf
+        self.ncalls = 0
+
+    def __getattr__(self, name):
+        return getattr(self.pdf, name)
+
+    def xfxQ(self, iflav, x, Q):
+        self.ncalls += 1
+        return self.pdf.xfxQ(iflav, x, Q)
+
+    def xfxQ_array(self, iflav, xs, Qs):
+        self.ncalls += np.size(xs)
+        return xfxQ_array(self.pdf, iflav, xs, Qs)
+
+
+def make_backend(backend, pdf, surrogate_tol):
+    "returns (counter, pdf_for_evaluation) for the given backend"
+    counter = countingPDF(pdf)
+    if (backend == "surrogate"):
+        # start from scratch, so that the fits are part of the cost
+        surrogate._cache.clear()
+        return counter, surrogate.SurrogatePDF(counter, surrogate_tol, disk_cache=False)
+    return counter, counter
+
+
+#----------------------------------------------------------------------
+def evaluate(quantity, pdf, args, points, dy_min, ny_min, nsub, dy_table):
+    "returns the values of quantity at the points (masses or Q values) for one configuration"
+    if (quantity == "lumi"):
+        if (dy_table is None):
+            return np.array([lumi.lumi(pdf, M, args.rts, args.flav1, args.flav2, args.eval, args.mu, dy_min, ny_min)
+                             for M in points])
+        else:
+            return np.array([lumi.lumi_multi_rts(pdf, M, [args.rts], args.flav1, args.flav2, args.eval, args.mu,
+                                                 dy_min, ny_min, dy_table)[0] for M in points])
+    elif (quantity == "mom"):
+        return np.array([mom.mom(pdf, Q, args.flav, None, None, dy_min, ny_min) for Q in points])
+    elif (quantity == "rapdist"):
+        ymax = log(args.rts/points[0])
+        dy = 2*ymax/args.ny
+        yvals = (-ymax + dy*(np.arange(args.ny)[:,np.newaxis] + (np.arange(nsub) + 0.5)/nsub)).flatten()
+        dlumi = lumi.dlumi_map(pdf, points, yvals, args.rts, args.flav1, args.flav2, args.eval, args.mu, dy_table)
+        return dlumi.reshape(len(points), args.ny, nsub).sum(axis=2) * dy/nsub
+    raise ValueError("unknown quantity "+quantity)
+
+
+def configurations(quantity, backends, dy_mins, ny_mins, nsubs, dy_tables, mu):
+    "yields (backend, dy_min, ny_min, nsub, dy_table) for each configuration to be tested"
+    for backend in backends:
+        if (quantity == "rapdist"):
+            if   (backend == "table"):
+                if (mu is None): continue
+                for nsub, dy_table in product(nsubs, dy_tables): yield backend, None, None, nsub, dy_table
+            else:
+                for nsub in nsubs: yield backend, None, None, nsub, None
+        elif (backend == "table"):
+            if (quantity != "lumi"): continue
+            for dy_min, ny_min, dy_table in product(dy_mins, ny_mins, dy_tables):
+                yield backend, dy_min, ny_min, None, dy_table
+        else:
+            for dy_min, ny_min in product(dy_mins, ny_mins):
+                yield backend, dy_min, ny_min, None, None
+
+
+def relative_error(values, ref):
+    """returns the largest relative deviation of values from ref; for 2d
+    arrays (rapdist), relative to the largest |ref| in each row
+    """
+    if (ref.ndim == 2): scale = np.max(np.abs(ref), axis=1, keepdims=True)
+    else              : scale = np.abs(ref)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.max(np.where(scale > 0, np.abs(values - ref)/scale, 0.0))
+
+
+def pareto(errors, costs):
+    "returns a boolean array that is True for the points not dominated in (error, cost)"
+    errors = np.asarray(errors)
+    costs = np.asarray(costs)
+    optimal = np.ones(len(errors), dtype=bool)
+    for i in range(len(errors)):
+        dominated = (errors <= errors[i]) & (costs <= costs[i]) & ((errors < errors[i]) | (costs < costs[i]))
+        optimal[i] = not np.any(dominated)
+    return optimal
+
+
+#----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='Accuracy versus cost of integration settings and backends')
+    parser.add_argument('-pdf', type=str, default=default_pdf, help='PDF name')
+    parser.add_argument('-imem', type=int, default=0, help='The member to use')
+    parser.add_argument('-quantities', type=str, default="lumi,mom,rapdist", help='Comma-separated list of lumi, mom, rapdist')
+    parser.add_argument('-backends', type=str, default="lhapdf,surrogate,table", help='Comma-separated list of lhapdf, surrogate, table')
+
+    parser.add_argument('-dy-min', type=str, default="0.4,0.2,0.1,0.05", help='Comma-separated values of dy_min')
+    parser.add_argument('-ny-min', type=str, default="25,50,100,200", help='Comma-separated values of ny_min')
+    parser.add_argument('-nsub', type=str, default="1,2,4,8", help='Comma-separated numbers of points per rapidity bin (rapdist)')
+    parser.add_argument('-dy-table', type=str, default="0.08,0.04,0.02,0.01", help='Comma-separated LnxTable spacings')
+    parser.add_argument('-surrogate-tol', type=float, default=1e-6, help='Tolerance of the surrogates')
+    parser.add_argument('-ref-dy-min', type=float, default=0.005, help='dy_min of the reference run')
+    parser.add_argument('-ref-ny-min', type=int, default=2000, help='ny_min of the reference run')
+    parser.add_argument('-ref-nsub', type=int, default=64, help='Points per rapidity bin of the rapdist reference run')
+
+    parser.add_argument("-rts", type=float, default=default_rts, help='Centre of mass energy (rts), in GeV')
+    parser.add_argument("-mass-lo", type=float, default=20.0, help='Lowest mass for lumi and rapdist')
+    parser.add_argument("-mass-hi", type=float, default=None, help='Highest mass (default: rts/4)')
+    parser.add_argument("-nmass", type=int, default=8, help='Number of masses')
+    parser.add_argument("-flav1", "-flv1", type=int, default=21, help="flavour from proton with +ve pz")
+    parser.add_argument("-flav2", "-flv2", type=int, default=21, help="flavour from proton with -ve pz")
+    parser.add_argument("-eval", type=str, default=None, help="a channel string as in lumi.py, e.g. g1*g2 or qqbar")
+    parser.add_argument("-mu", type=float, default=None, help='fixed factorisation scale (default: mu = M)')
+    parser.add_argument("-ny", type=int, default=20, help='Number of rapidity bins for rapdist')
+
+    parser.add_argument("-Q-lo", type=float, default=10.0, help='Lowest Q for mom')
+    parser.add_argument("-Q-hi", type=float, default=1000.0, help='Highest Q for mom')
+    parser.add_argument("-nQ", type=int, default=4, help='Number of Q values for mom')
+    parser.add_argument("-flav", "-flv", type=int, default=21, help='Flavour for mom')
+
+    parser.add_argument("-tol", type=float, default=1e-4, help='Target relative error for the recommended configuration')
+    parser.add_argument('-pareto-only', action='store_true', help='Only print the Pareto-optimal configurations')
+    parser.add_argument('-out', '-o', type=str, dest="out", default="", help='Output file (default is stdout)')
+    args = parser.parse_args()
+
+    if (args.out != ""):
+        out = open(args.out,'w')
+    else:
+        out = sys.stdout
+
+    pdfset = lhapdf.getPDFSet(args.pdf)
+    pdf = pdfset.mkPDF(args.imem)
+    backends  = args.backends.split(',')
+    dy_mins   = [float(v) for v in args.dy_min.split(',')]
+    ny_mins   = [int(v)   for v in args.ny_min.split(',')]
+    nsubs     = [int(v)   for v in args.nsub.split(',')]
+    dy_tables = [float(v) for v in args.dy_table.split(',')]
+
+    mass_lo = max(args.mass_lo, sqrt(pdf.xMin) * args.rts)
+    mass_hi = args.mass_hi if args.mass_hi is not None else args.rts/4.0
+    masses = mass_lo*(mass_hi/mass_lo)**((1.0*np.arange(0,args.nmass))/max(1,args.nmass-1))
+    Q_lo = max(args.Q_lo, sqrt(pdf.q2Min))
+    Qvals = Q_lo*(args.Q_hi/Q_lo)**((1.0*np.arange(0,args.nQ))/max(1,args.nQ-1))
+
+    print("#", " ".join(sys.argv), file=out)
+    print(f"# pdf = {args.pdf}, imem = {args.imem}, version = {pdfset.dataversion}, rts = {args.rts}", file=out)
+    print("# Columns: quantity backend dy_min ny_min nsub dy_table rel_err time_s pdf_calls pareto_time pareto_calls", file=out)
+
+    for quantity in args.quantities.split(','):
+        points = Qvals if quantity == "mom" else masses
+
+        counter, ref_pdf = make_backend("lhapdf", pdf, args.surrogate_tol)
+        start = time.perf_counter()
+        if (quantity == "rapdist"):
+            ref = evaluate(quantity, ref_pdf, args, points, None, None, args.ref_nsub, None)
+        else:
+            ref = evaluate(quantity, ref_pdf, args, points, args.ref_dy_min, args.ref_ny_min, None, None)
+        print("# {}: reference run took {:.3g}s and {} PDF calls".format(
+            quantity, time.perf_counter()-start, counter.ncalls), file=out)
+
+        rows = []
+        for backend, dy_min, ny_min, nsub, dy_table in configurations(quantity, backends, dy_mins, ny_mins, nsubs,
+                                                                        dy_tables, args.mu):
+            counter, eval_pdf = make_backend(backend, pdf, args.surrogate_tol)
+            start = time.perf_counter()
+            values = evaluate(quantity, eval_pdf, args, points, dy_min, ny_min, nsub, dy_table)
+            elapsed = time.perf_counter() - start
+            rows.append((backend, dy_min, ny_min, nsub, dy_table, relative_error(values, ref), elapsed, counter.ncalls))
+        if (len(rows) == 0): continue
+
+        errors = [row[5] for row in rows]
+        pareto_time  = pareto(errors, [row[6] for row in rows])
+        pareto_calls = pareto(errors, [row[7] for row in rows])
+        show = lambda value: "-" if value is None else str(value)
+        for irow in np.argsort([row[6] for row in rows]):
+            backend, dy_min, ny_min, nsub, dy_table, error, elapsed, ncalls = rows[irow]
+            if (args.pareto_only and not (pareto_time[irow] or pareto_calls[irow])): continue
+            print("{:8s} {:10s} {:>6s} {:>6s} {:>6s} {:>6s} {:10.3g} {:10.3g} {:10d} {:d} {:d}".format(
+                quantity, backend, show(dy_min), show(ny_min), show(nsub), show(dy_table), error, elapsed, ncalls,
+                int(pareto_time[irow]), int(pareto_calls[irow])), file=out)
+
+        accurate = [irow for irow in range(len(rows)) if rows[irow][5] < args.tol]
+        if (accurate):
+            backend, dy_min, ny_min, nsub, dy_table, error, elapsed, ncalls = rows[min(accurate, key=lambda irow: rows[irow][6])]
+            print("# {}: fastest with rel_err < {:g}: backend = {}, dy_min = {}, ny_min = {}, nsub = {}, dy_table = {} "
+                  "(rel_err = {:.3g}, {:.3g}s)".format(quantity, args.tol, backend, show(dy_min), show(ny_min),
+                                                      show(nsub), show(dy_table), error, elapsed), file=out)
+        else:
+            print("# {}: no configuration reaches rel_err < {:g}".format(quantity, args.tol), file=out)
+        print("", file=out)
+
+
+if __name__ == '__main__': main()
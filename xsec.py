@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Hadronic cross sections from the convolution of the lumi with a
+partonic cross section sigma_hat(shat, y). Usage:
+
+    ./xsec.py [-pdf PDF] [-flav1 F1] [-flav2 F2] [-eval STRING] [-rts RTS] [-mu MU] \\
+              {-sigma EXPR | -sigma-file FILE} -mass-bins M0,M1,... [-y-bins Y0,Y1,...] [-err | -fullerr]
+
+With the lumi normalisation of lumi.py (dlumi = x1*f1 * x2*f2 per unit
+rapidity, i.e. M^2/s times the usual luminosity),
+
+    sigma = int (2 dM/M) int dy dlumi(M, y) sigma_hat(M^2, y)
+
+which is integrated with the mid-point rule in ln(M) and y (-nsub
+points per bin in each, the y nodes of each mass lying within its own
+kinematic range, |y| < ln(rts/M)). As an estimate of the integration
+error, the output header gives the largest relative change of a bin
+(for member 0) when going from -nsub/2 to -nsub points. sigma_hat can be
+
+  - a numpy-vectorisable expression in shat, M and y (with np, pi, sqrt,
+    log, exp and gev2_to_pb available), e.g. -sigma 'gev2_to_pb*pi/shat'
+  - a file whose first two columns are M and sigma_hat(M), interpolated
+    linearly in ln(M) and taken to be zero outside the tabulated range
+
+The cross section has the units of sigma_hat.
+"""
+import argparse
+from pdf_base import *
+import lumi
+
+# conversion factor from GeV^-2 to pb
+gev2_to_pb = 0.3893793721e9
+
+
+#----------------------------------------------------------------------
+def sigma_from_expression(expression):
+    "returns a vectorised function sigma_hat(shat, y) from a string in shat, M and y"
+    code = compile(expression, '<sigma>', mode='eval')
+    namespace = {"np" : np, "pi" : np.pi, "sqrt" : np.sqrt, "log" : np.log, "exp" : np.exp,
+                 "gev2_to_pb" : gev2_to_pb}
+    return lambda shat, y: np.broadcast_to(eval(code, namespace, {"shat" : shat, "M" : np.sqrt(shat), "y" : y}),
+                                           np.broadcast(shat, y).shape)
+
+
+def sigma_from_file(filename):
+    "returns a function sigma_hat(shat, y) interpolated from the (M, sigma_hat) columns of filename"
+    Mvals, sigmas = np.loadtxt(filename, usecols=(0,1), unpack=True)
+    order = np.argsort(Mvals)
+    lnM, sigmas = np.log(Mvals[order]), sigmas[order]
+    return lambda shat, y: np.broadcast_to(np.interp(0.5*np.log(shat), lnM, sigmas, left=0.0, right=0.0),
+                                           np.broadcast(shat, y).shape)
+
+
+def convolute(pdfs, sigma_hat, mass_edges, y_edges, rts, flav1, flav2, flv_string=None, mu=None, nsub = 20):
+    """returns an array of shape (mass bins, y bins, member) with the
+    cross section in each bin for each of the pdfs, given a vectorised
+    sigma_hat(shat, y). For each mass node, the y nodes cover the part
+    of each y bin inside that mass's own range, |y| < ln(rts/M).
+
+    For two different flavours, the lumi is f1(x1) f2(x2) + f2(x1) f1(x2),
+    which is correct for any y bins; an -eval string is used as it is,
+    so for y bins that are not symmetric about zero it should contain
+    both orderings (e.g. u1*dbar2 + dbar1*u2).
+    """
+    mass_edges = np.asarray(mass_edges, dtype=float)
+    y_edges = np.asarray(y_edges, dtype=float)
+    nmbin, nybin = len(mass_edges)-1, len(y_edges)-1
+
+    # mid-point nodes, nsub per bin, and their weights (2 dlnM and dy)
+    frac = (np.arange(nsub) + 0.5) / nsub
+    lnM_lo, dlnM = np.log(mass_edges[:-1]), np.diff(np.log(mass_edges))
+    masses = np.exp(lnM_lo[:,np.newaxis] + dlnM[:,np.newaxis]*frac).flatten()
+    mass_weights = np.repeat(2*dlnM/nsub, nsub)
+
+    # for each mass, the y bins clipped to its kinematic range
+    ymax = np.log(rts/masses)[:,np.newaxis]
+    y_lo = np.clip(y_edges[np.newaxis,:-1], -ymax, ymax)
+    y_hi = np.clip(y_edges[np.newaxis,1:],  -ymax, ymax)
+    yvals = (y_lo[:,:,np.newaxis] + (y_hi - y_lo)[:,:,np.newaxis]*frac).reshape(len(masses), nybin*nsub)
+    y_weights = np.repeat((y_hi - y_lo)/nsub, nsub, axis=1)
+
+    # the partonic cross section and integration weights, common to all members
+    kernel = sigma_hat(masses[:,np.newaxis]**2, yvals) * mass_weights[:,np.newaxis] * y_weights
+
+    # the flavour orderings to be summed (each lumi.dlumi_map includes
+    # a factor 2 for different flavours)
+    if (flv_string is None and flav1 != flav2): orderings = [(flav1, flav2, 0.5), (flav2, flav1, 0.5)]
+    else                                     : orderings = [(flav1, flav2, 1.0)]
+
+    res = np.empty((nmbin, nybin, len(pdfs)))
+    for ipdf, pdf in enumerate(pdfs):
+        dlumi = np.zeros(yvals.shape)
+        for im, mass in enumerate(masses):
+            for f1, f2, factor in orderings:
+                dlumi[im] += factor * lumi.dlumi_map(pdf, [mass], yvals[im], rts, f1, f2, flv_string, mu, dy_table = None)[0]
+        res[:,:,ipdf] = (kernel * dlumi).reshape(nmbin, nsub, nybin, nsub).sum(axis=(1,3))
+    return res
+
+
+#----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='Convolute the lumi with a partonic cross section')
+    parser.add_argument('-pdf', type=str, default=default_pdf, help='PDF name')
+    parser.add_argument('-imem', type=int, default=0, help='The member to examine')
+    parser.add_argument('-err', action='store_true', help='Output the symm err')
+    parser.add_argument('-fullerr', action='store_true', help='Output the full error info')
+    parser.add_argument('-medianerr', action='store_true', help='use a median + interval uncertainty')
+
+    parser.add_argument("-rts", type=float, default=default_rts, help='Centre of mass energy (rts), in GeV')
+    parser.add_argument("-mu", type=float, default=None, help='fixed factorisation scale (default: mu = M)')
+    parser.add_argument("-flav1", "-flv1", type=int, default=21, help="flavour from proton with +ve pz")
+    parser.add_argument("-flav2", "-flv2", type=int, default=21, help="flavour from proton with -ve pz")
+    parser.add_argument("-eval", type=str, help="a channel string as in lumi.py, e.g. g1*g2 or qqbar")
+
+    parser.add_argument("-sigma", type=str, default="", help="partonic cross section as an expression in shat, M and y")
+    parser.add_argument("-sigma-file", type=str, default="", help="file with columns M and sigma_hat")
+    parser.add_argument("-mass-bins", type=str, required=True, help="comma-separated mass bin edges")
+    parser.add_argument("-y-bins", type=str, default="", help="comma-separated rapidity bin edges (default: the full range)")
+    parser.add_argument("-nsub", type=int, default=20, help="integration points per bin in each of ln(M) and y")
+
+    parser.add_argument('-out', '-o', type=str, dest="out", default="", help='Output file (default is stdout)')
+    parser.add_argument('-prec', type=int, default=5, help='Number of digits of precision in printout (default 5)')
+
+    args = parser.parse_args()
+    err = args.err or args.fullerr
+
+    if   (args.sigma      != ""): sigma_hat = sigma_from_expression(args.sigma)
+    elif (args.sigma_file != ""): sigma_hat = sigma_from_file(args.sigma_file)
+    else: parser.error("one of -sigma or -sigma-file must be given")
+
+    mass_edges = [float(m) for m in args.mass_bins.split(',')]
+    if (args.y_bins != ""):
+        y_edges = [float(y) for y in args.y_bins.split(',')]
+    else:
+        ymax = np.log(args.rts/mass_edges[0])
+        y_edges = [-ymax, ymax]
+
+    if (args.out != ""):
+        out = open(args.out,'w')
+    else:
+        out = sys.stdout
+    format="{{:<{}.{}g}}".format(args.prec+7,args.prec)
+
+    pdfset = lhapdf.getPDFSet(args.pdf)
+    pdfs = pdfset.mkPDFs() if err else [pdfset.mkPDF(args.imem)]
+    res = convolute(pdfs, sigma_hat, mass_edges, y_edges, args.rts, args.flav1, args.flav2, args.eval, args.mu, args.nsub)
+    # an estimate of the integration error, from member 0 with half the -nsub
+    nsub_check = max(1, args.nsub//2)
+    check = convolute(pdfs[:1], sigma_hat, mass_edges, y_edges, args.rts, args.flav1, args.flav2, args.eval, args.mu, nsub_check)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        integration_change = np.nanmax(np.abs(check[...,0] - res[...,0]) / np.abs(res[...,0]))
+    # append the total, summed over all bins
+    binned = res.reshape(-1, len(pdfs))
+    values = np.concatenate((binned, binned.sum(axis=0)[np.newaxis,:]))
+
+    print("#", " ".join(sys.argv), file=out)
+    print(f"# pdf = {args.pdf}, imem = {args.imem}, rts = {args.rts}, pdf_version = {pdfset.dataversion}", file=out)
+    print("# largest relative change of a bin from -nsub {} to {} (member 0): {:.2g}".format(
+        nsub_check, args.nsub, integration_change), file=out)
+    header = "# Columns: mass_lo mass_hi y_lo y_hi sigma"
+    if err:
+        uncert = bulkUncert(pdfset, values, args.medianerr)
+        columns = [uncert.central, uncert.errsymm]
+        header += " errsymm"
+        if args.fullerr:
+            columns += [uncert.central-np.abs(uncert.errminus), uncert.central+uncert.errplus]
+            header += " bandlo bandhi"
+    else:
+        columns = [values[:,0]]
+    print(header, file=out)
+    print("# the last line is the total over all bins", file=out)
+
+    edges = [(mass_edges[im], mass_edges[im+1], y_edges[iy], y_edges[iy+1])
+             for im in range(len(mass_edges)-1) for iy in range(len(y_edges)-1)]
+    edges.append((mass_edges[0], mass_edges[-1], y_edges[0], y_edges[-1]))
+    print(reformat(np.array(edges), np.array(columns).T, format=format), file=out)
+
+
+if __name__ == '__main__': main()